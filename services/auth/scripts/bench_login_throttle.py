@@ -0,0 +1,139 @@
+"""Benchmark: legitimate login throughput during a credential-stuffing attack.
+
+Models the ``login`` hot path (throttle check, then a bcrypt verification on a
+bounded CPU pool) without a database, and runs three phases:
+
+1. ``baseline``      - legitimate users only
+2. ``attack``        - legitimate users plus attackers, throttle disabled
+3. ``attack+throttle`` - same traffic, with ``LoginThrottle`` in front of bcrypt
+
+Each phase is measured after a warmup, so the throttled phase reports the
+steady state of a sustained attack rather than the attackers' initial burst.
+
+Attackers hammer a handful of victim emails from a few client addresses, the
+typical shape of a targeted stuffing burst.
+
+    python scripts/bench_login_throttle.py --duration 30 --workers 4
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from passlib.context import CryptContext  # noqa: E402
+
+from src.login_throttle import LoginThrottle, ThrottlePolicy  # noqa: E402
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class Phase:
+    def __init__(self, name: str, throttle: LoginThrottle = None):
+        self.name = name
+        self.throttle = throttle
+        self.measure_from = 0.0
+        self.legit_ok = 0
+        self.legit_rejected = 0
+        self.attack_verified = 0
+        self.attack_rejected = 0
+        self.legit_latency = []
+
+
+async def attempt(phase: Phase, pool, password_hash: str, email: str, client: str, password: str):
+    if phase.throttle:
+        allowed, _ = await phase.throttle.check(email, client)
+        if not allowed:
+            return None
+    loop = asyncio.get_running_loop()
+    ok = await loop.run_in_executor(pool, pwd_context.verify, password, password_hash)
+    if ok and phase.throttle:
+        await phase.throttle.succeeded(email)
+    return ok
+
+
+async def legit_user(phase: Phase, pool, password_hash: str, user: int, deadline: float, think_time: float):
+    email, client = f"user{user}@example.com", f"10.0.{user // 250}.{user % 250}"
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        result = await attempt(phase, pool, password_hash, email, client, "correct-password")
+        if time.monotonic() >= deadline:
+            break  # finished after the phase ended, not counted
+        if time.monotonic() < phase.measure_from:
+            pass  # still warming up
+        elif result is None:
+            phase.legit_rejected += 1
+        elif result:
+            phase.legit_ok += 1
+            phase.legit_latency.append(time.perf_counter() - start)
+        await asyncio.sleep(think_time)
+
+
+async def attacker(phase: Phase, pool, password_hash: str, worker: int, deadline: float, victims: int, rtt: float):
+    n = 0
+    while time.monotonic() < deadline:
+        email, client = f"victim{n % victims}@example.com", f"203.0.113.{worker % 4}"
+        result = await attempt(phase, pool, password_hash, email, client, f"guess-{n}")
+        if time.monotonic() >= deadline:
+            break
+        if result is None:
+            await asyncio.sleep(rtt)  # rejected immediately, retry after a network round-trip
+        if time.monotonic() < phase.measure_from:
+            pass
+        elif result is None:
+            phase.attack_rejected += 1
+        else:
+            phase.attack_verified += 1
+        n += 1
+
+
+async def run_phase(phase: Phase, args, password_hash: str, with_attack: bool):
+    pool = ThreadPoolExecutor(max_workers=args.workers)
+    phase.measure_from = time.monotonic() + args.warmup
+    deadline = phase.measure_from + args.duration
+    tasks = [legit_user(phase, pool, password_hash, u, deadline, args.think_time) for u in range(args.users)]
+    if with_attack:
+        tasks += [attacker(phase, pool, password_hash, w, deadline, args.victims, args.rtt) for w in range(args.attackers)]
+    await asyncio.gather(*tasks)
+    pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per phase")
+    parser.add_argument("--warmup", type=float, default=10.0,
+                        help="Unmeasured seconds first, so attackers exhaust their initial burst")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="bcrypt CPU workers")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent legitimate users")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Pause between legitimate logins")
+    parser.add_argument("--attackers", type=int, default=64, help="Concurrent attacker connections")
+    parser.add_argument("--victims", type=int, default=10, help="Distinct emails targeted")
+    parser.add_argument("--rtt", type=float, default=0.005, help="Attacker round-trip before retrying a 429")
+    args = parser.parse_args()
+
+    password_hash = pwd_context.hash("correct-password")
+    phases = [
+        (Phase("baseline"), False),
+        (Phase("attack"), True),
+        (Phase("attack+throttle", LoginThrottle(
+            email_policy=ThrottlePolicy("email", 5, 5),
+            client_policy=ThrottlePolicy("client", 30, 60),
+        )), True),
+    ]
+    for phase, with_attack in phases:
+        print(f"Running {phase.name} for {args.warmup + args.duration:.0f}s...")
+        asyncio.run(run_phase(phase, args, password_hash, with_attack))
+
+    print(f"\n{'phase':<18}{'legit/s':>9}{'legit p99 ms':>14}{'legit 429':>11}{'attack bcrypt/s':>17}{'attack 429':>12}")
+    for phase, _ in phases:
+        latency = sorted(phase.legit_latency)
+        p99 = latency[int(len(latency) * 0.99) - 1] * 1000 if latency else float("nan")
+        print(f"{phase.name:<18}{phase.legit_ok / args.duration:>9.1f}{p99:>14.1f}{phase.legit_rejected:>11}"
+              f"{phase.attack_verified / args.duration:>17.1f}{phase.attack_rejected:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Micro-benchmark: per-request Python overhead of the ``login`` lookups.
+
+Compares the previous ``db.query(User).filter(...).first()`` lookups used by
+``login``/``register`` (by email) and ``get_current_user`` (by id) against the
+prebuilt statements in ``src.queries``. The default target is an
+in-memory SQLite database so the numbers are dominated by Python-side query
+construction, cache-key generation and result handling rather than by I/O.
+
+    python scripts/bench_queries.py --iterations 20000
+    python scripts/bench_queries.py --database-url postgresql+psycopg://...
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from src.database import Base, User, UserRole  # noqa: E402
+from src.queries import user_by_id, user_by_email  # noqa: E402
+from src.partitioning import user_email_clause  # noqa: E402
+
+USER_ID = 1
+USER_EMAIL = "bench-user@example.com"
+
+
+def timed(label: str, fn, iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        fn()  # warm SQLAlchemy's compiled cache and the connection
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations * 1e6
+    print(f"  {label:<34}{per_call:>9.1f} us/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine, tables=[User.__table__])
+    with Session(engine) as db:
+        if user_by_id(db, USER_ID) is None:
+            db.add(User(id=USER_ID, email=USER_EMAIL, password_hash="x", role=UserRole.ATTENDEE))
+            db.commit()
+
+    with Session(engine) as db:
+        print("login/register: lookup by email")
+        legacy = timed("db.query(...).filter(...).first()",
+                       lambda: db.query(User).filter(user_email_clause(User, USER_EMAIL)).first(),
+                       args.iterations)
+        cached = timed("queries.user_by_email()", lambda: user_by_email(db, USER_EMAIL), args.iterations)
+        print(f"  saved {legacy - cached:.1f} us/request ({(legacy - cached) / legacy:.0%})")
+
+        print("get_current_user: lookup by id")
+        legacy = timed("db.query(...).filter(...).first()",
+                       lambda: db.query(User).filter(User.id == USER_ID).first(), args.iterations)
+        cached = timed("queries.user_by_id()", lambda: user_by_id(db, USER_ID), args.iterations)
+        print(f"  saved {legacy - cached:.1f} us/request ({(legacy - cached) / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Adaptive concurrency limiting and load shedding middleware.
+
+Every route group gets its own gradient-style concurrency limit that follows
+observed latency: while latency stays near its long-term baseline the limit
+grows, and when requests start queueing behind the sync DB pool or bcrypt the
+limit shrinks. Requests over the limit wait in a small bounded queue with a
+deadline; anything that cannot be admitted in time is rejected immediately
+with ``503`` and a ``Retry-After`` header instead of piling up until clients
+time out and retry.
+
+Route groups carry a priority. Critical routes (``/health``) are never
+limited, and once the process as a whole is close to its global in-flight
+budget, sheddable routes are rejected before normal ones.
+"""
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+LOAD_SHEDDING_ENABLED = os.getenv("LOAD_SHEDDING_ENABLED", "true").lower() == "true"
+LOAD_SHEDDING_GLOBAL_LIMIT = int(os.getenv("LOAD_SHEDDING_GLOBAL_LIMIT", "64"))
+LOAD_SHEDDING_INITIAL_LIMIT = int(os.getenv("LOAD_SHEDDING_INITIAL_LIMIT", "16"))
+LOAD_SHEDDING_MIN_LIMIT = int(os.getenv("LOAD_SHEDDING_MIN_LIMIT", "2"))
+LOAD_SHEDDING_MAX_LIMIT = int(os.getenv("LOAD_SHEDDING_MAX_LIMIT", "128"))
+
+PRIORITY_CRITICAL = 0
+PRIORITY_NORMAL = 1
+PRIORITY_SHEDDABLE = 2
+
+# Share of the global in-flight budget each priority may use before its
+# requests are shed outright. Critical routes bypass limiting entirely.
+PRIORITY_BUDGET_SHARE = {
+    PRIORITY_NORMAL: 1.0,
+    PRIORITY_SHEDDABLE: 0.75,
+}
+
+
+class RoutePolicy:
+    """Matches requests to a route group and describes how it is limited."""
+
+    def __init__(self, name: str, methods: List[str], pattern: str, priority: int = PRIORITY_NORMAL,
+                 max_queue: int = 32, queue_timeout: float = 0.5):
+        self.name = name
+        self.methods = {m.upper() for m in methods}
+        self.pattern = re.compile(pattern)
+        self.priority = priority
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+    def matches(self, method: str, path: str) -> bool:
+        return ("*" in self.methods or method in self.methods) and self.pattern.fullmatch(path) is not None
+
+
+class AdaptiveLimiter:
+    """
+    Gradient concurrency limit with AIMD backoff.
+
+    The limit is scaled by ``long_rtt / short_rtt`` (clamped to [0.5, 1.0]), so it
+    only shrinks when latency rises, and is cut multiplicatively when a request
+    fails. A ``sqrt(limit)`` headroom lets it probe upwards, but only while the
+    route actually uses at least half of its limit; an idle route keeps its
+    limit. Shed requests never change the limit: a burst that overflows the
+    queue says nothing about whether the backend is slowing down.
+    """
+
+    def __init__(self, policy: RoutePolicy, initial_limit: int = LOAD_SHEDDING_INITIAL_LIMIT,
+                 min_limit: int = LOAD_SHEDDING_MIN_LIMIT, max_limit: int = LOAD_SHEDDING_MAX_LIMIT,
+                 smoothing: float = 0.2, tolerance: float = 1.5, backoff_ratio: float = 0.9):
+        self.policy = policy
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.long_rtt: Optional[float] = None
+        self.short_rtt: Optional[float] = None
+
+        # Counters exposed through the metrics endpoint
+        self.accepted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.shed_priority = 0
+        self.failed = 0
+
+    @property
+    def shed_total(self) -> int:
+        return self.shed_queue_full + self.shed_timeout + self.shed_priority
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def retry_after(self) -> int:
+        """Estimate how long until queued work drains, in whole seconds (at least 1)."""
+        rtt = self.long_rtt or self.policy.queue_timeout
+        backlog = (len(self.waiters) + self.in_flight) / max(self.limit, 1.0)
+        return max(1, math.ceil(rtt * backlog))
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the bounded queue up to the policy deadline."""
+        if self.has_capacity() and not self.waiters:
+            self.in_flight += 1
+            return True
+        if len(self.waiters) >= self.policy.max_queue:
+            self.shed_queue_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.policy.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as the deadline expired
+                return True
+            self.shed_timeout += 1
+            return False
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if not waiter.done():
+                waiter.cancel()
+
+    def release(self, rtt: float, success: bool):
+        """Return a slot, feed the latency sample to the limit and wake the next waiter."""
+        self.in_flight -= 1
+        if success:
+            self.accepted += 1
+            self._update(rtt)
+        else:
+            self.failed += 1
+            self._backoff()
+        self._wake()
+
+    def _update(self, rtt: float):
+        # Called after in_flight was decremented, so count this request back in
+        utilised = 2 * (self.in_flight + 1) >= self.limit
+        if self.long_rtt is None:
+            self.long_rtt = self.short_rtt = rtt
+        else:
+            self.short_rtt = 0.5 * self.short_rtt + 0.5 * rtt
+            # Long-term baseline moves slowly so a sustained slowdown still registers
+            self.long_rtt = 0.95 * self.long_rtt + 0.05 * rtt
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / max(self.short_rtt, 1e-6)))
+        new_limit = self.limit * gradient + (math.sqrt(self.limit) if utilised else 0.0)
+        self.limit = (1 - self.smoothing) * self.limit + self.smoothing * new_limit
+        self.limit = max(self.min_limit, min(self.max_limit, self.limit))
+
+    def _backoff(self):
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+    def _wake(self):
+        while self.waiters and self.has_capacity():
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
+
+    def snapshot(self) -> dict:
+        total = self.accepted + self.failed + self.shed_total
+        return {
+            "priority": self.policy.priority,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "max_queue": self.policy.max_queue,
+            "rtt_ms": {
+                "short": round(self.short_rtt * 1000, 2) if self.short_rtt is not None else None,
+                "long": round(self.long_rtt * 1000, 2) if self.long_rtt is not None else None,
+            },
+            "accepted": self.accepted,
+            "failed": self.failed,
+            "shed": {
+                "queue_full": self.shed_queue_full,
+                "timeout": self.shed_timeout,
+                "priority": self.shed_priority,
+                "total": self.shed_total,
+            },
+            "shed_rate": round(self.shed_total / total, 4) if total else 0.0,
+        }
+
+
+class LoadShedder:
+    """Holds the per-route limiters and the process-wide in-flight budget."""
+
+    def __init__(self, policies: List[RoutePolicy], global_limit: int = LOAD_SHEDDING_GLOBAL_LIMIT):
+        self.policies = policies
+        self.global_limit = global_limit
+        self.global_in_flight = 0
+        self.limiters: Dict[str, AdaptiveLimiter] = {p.name: AdaptiveLimiter(p) for p in policies}
+
+    def match(self, method: str, path: str) -> Optional[AdaptiveLimiter]:
+        for policy in self.policies:
+            if policy.matches(method, path):
+                return self.limiters[policy.name]
+        return None
+
+    def over_budget(self, priority: int) -> bool:
+        share = PRIORITY_BUDGET_SHARE.get(priority, 1.0)
+        return self.global_in_flight >= self.global_limit * share
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": LOAD_SHEDDING_ENABLED,
+            "global_limit": self.global_limit,
+            "global_in_flight": self.global_in_flight,
+            "routes": {name: limiter.snapshot() for name, limiter in self.limiters.items()},
+        }
+
+
+class LoadSheddingMiddleware:
+    """ASGI middleware applying a ``LoadShedder`` to every HTTP request."""
+
+    def __init__(self, app, shedder: LoadShedder):
+        self.app = app
+        self.shedder = shedder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not LOAD_SHEDDING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.shedder.match(scope["method"], scope["path"])
+        if limiter is None or limiter.policy.priority == PRIORITY_CRITICAL:
+            await self.app(scope, receive, send)
+            return
+
+        if self.shedder.over_budget(limiter.policy.priority):
+            limiter.shed_priority += 1
+            await self._reject(send, limiter)
+            return
+
+        if not await limiter.acquire():
+            await self._reject(send, limiter)
+            return
+
+        self.shedder.global_in_flight += 1
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.shedder.global_in_flight -= 1
+            limiter.release(time.perf_counter() - start, success=status_code < 500)
+
+    async def _reject(self, send, limiter: AdaptiveLimiter):
+        body = json.dumps({"detail": "Service overloaded, please retry later"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(limiter.retry_after()).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,236 @@
+"""Pre-bcrypt login throttling for Auth service.
+
+``login`` costs a DB lookup plus a full bcrypt verification, so credential
+stuffing against one email, or from one client, burns as much CPU as real
+users. ``LoginThrottle`` checks token buckets keyed by email and by client
+address *before* any of that work and rejects over-limit attempts with 429.
+
+Every attempt takes a token from both buckets; a successful login gives the
+email token back, so legitimate users are not penalised for logging in.
+
+Buckets live in process memory (bounded LRU) by default. Set
+``LOGIN_THROTTLE_REDIS_URL`` to share them across replicas; this needs the
+optional ``redis`` package. If Redis is unreachable the in-memory buckets are
+used instead, so a Redis outage never blocks logins.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+LOGIN_THROTTLE_ENABLED = os.getenv("LOGIN_THROTTLE_ENABLED", "true").lower() == "true"
+LOGIN_THROTTLE_EMAIL_BURST = int(os.getenv("LOGIN_THROTTLE_EMAIL_BURST", "5"))
+LOGIN_THROTTLE_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_THROTTLE_EMAIL_PER_MINUTE", "5"))
+LOGIN_THROTTLE_CLIENT_BURST = int(os.getenv("LOGIN_THROTTLE_CLIENT_BURST", "30"))
+LOGIN_THROTTLE_CLIENT_PER_MINUTE = float(os.getenv("LOGIN_THROTTLE_CLIENT_PER_MINUTE", "60"))
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+# Number of reverse proxies in front of auth that append to X-Forwarded-For (e.g. 1 for
+# Kong). 0 ignores the header: its left-most hops are set by the client and can be forged.
+LOGIN_THROTTLE_TRUSTED_PROXIES = int(os.getenv("LOGIN_THROTTLE_TRUSTED_PROXIES", "0"))
+LOGIN_THROTTLE_REDIS_URL = os.getenv("LOGIN_THROTTLE_REDIS_URL")
+
+
+class ThrottlePolicy:
+    """Token bucket: ``burst`` attempts at once, refilled at ``per_minute``."""
+
+    def __init__(self, name: str, burst: int, per_minute: float):
+        self.name = name
+        self.burst = burst
+        self.rate = per_minute / 60.0
+
+    def retry_after(self, tokens: float) -> int:
+        """Whole seconds until one token is available again (at least 1)."""
+        if self.rate <= 0:
+            return 60
+        return max(1, int((1.0 - tokens) / self.rate + 0.999))
+
+
+class InMemoryBuckets:
+    """Token buckets in a bounded LRU map; least recently used keys are evicted first."""
+
+    def __init__(self, max_keys: int = LOGIN_THROTTLE_MAX_KEYS):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def _refill(self, key: str, policy: ThrottlePolicy, now: float) -> list:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [float(policy.burst), now]
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+            bucket[1] = now
+        return bucket
+
+    async def take(self, key: str, policy: ThrottlePolicy) -> Tuple[bool, int]:
+        bucket = self._refill(key, policy, time.monotonic())
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return True, 0
+        return False, policy.retry_after(bucket[0])
+
+    async def give_back(self, key: str, policy: ThrottlePolicy):
+        bucket = self.buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(policy.burst, bucket[0] + 1.0)
+
+
+# KEYS[1] = bucket key; ARGV = burst, rate per second, now, cost
+REDIS_TAKE_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / math.max(rate, 0.001)) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by all replicas, updated atomically by a Lua script."""
+
+    def __init__(self, url: str, prefix: str = "login-throttle:"):
+        import redis.asyncio as redis  # optional dependency
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(REDIS_TAKE_SCRIPT)
+
+    async def _run(self, key: str, policy: ThrottlePolicy, cost: float):
+        return await self.script(
+            keys=[self.prefix + key], args=[policy.burst, policy.rate, time.time(), cost]
+        )
+
+    async def take(self, key: str, policy: ThrottlePolicy) -> Tuple[bool, int]:
+        allowed, tokens = await self._run(key, policy, 1)
+        if int(allowed):
+            return True, 0
+        return False, policy.retry_after(float(tokens))
+
+    async def give_back(self, key: str, policy: ThrottlePolicy):
+        await self._run(key, policy, -1)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LoginThrottle:
+    """Rejects login attempts over the per-email or per-client budget before DB/bcrypt work."""
+
+    def __init__(self, email_policy: ThrottlePolicy, client_policy: ThrottlePolicy):
+        self.email_policy = email_policy
+        self.client_policy = client_policy
+        self.local = InMemoryBuckets()
+        self.shared: Optional[RedisBuckets] = None
+
+        self.allowed = 0
+        self.rejected_email = 0
+        self.rejected_client = 0
+        self.backend_errors = 0
+
+    async def start(self):
+        if not LOGIN_THROTTLE_REDIS_URL:
+            return
+        try:
+            self.shared = RedisBuckets(LOGIN_THROTTLE_REDIS_URL)
+            await self.shared.client.ping()
+            print("✅ Login throttle using shared Redis backend")
+        except Exception as e:
+            self.shared = None
+            print(f"⚠️ Login throttle falling back to in-memory buckets: {e}")
+
+    async def stop(self):
+        if self.shared:
+            await self.shared.close()
+
+    async def _take(self, key: str, policy: ThrottlePolicy) -> Tuple[bool, int]:
+        if self.shared:
+            try:
+                return await self.shared.take(key, policy)
+            except Exception as e:
+                self.backend_errors += 1
+                print(f"⚠️ Login throttle backend error, using in-memory buckets: {e}")
+        return await self.local.take(key, policy)
+
+    async def check(self, email: str, client: str) -> Tuple[bool, int]:
+        """Take one attempt from the client and email buckets. Returns (allowed, retry_after)."""
+        if not LOGIN_THROTTLE_ENABLED:
+            return True, 0
+        allowed, retry_after = await self._take(f"client:{client}", self.client_policy)
+        if not allowed:
+            self.rejected_client += 1
+            return False, retry_after
+        allowed, retry_after = await self._take(f"email:{email.strip().lower()}", self.email_policy)
+        if not allowed:
+            self.rejected_email += 1
+            return False, retry_after
+        self.allowed += 1
+        return True, 0
+
+    async def succeeded(self, email: str):
+        """Refund the email attempt after a successful login."""
+        if not LOGIN_THROTTLE_ENABLED:
+            return
+        key = f"email:{email.strip().lower()}"
+        if self.shared:
+            try:
+                await self.shared.give_back(key, self.email_policy)
+                return
+            except Exception:
+                self.backend_errors += 1
+        await self.local.give_back(key, self.email_policy)
+
+    def metrics(self) -> dict:
+        total = self.allowed + self.rejected_email + self.rejected_client
+        return {
+            "enabled": LOGIN_THROTTLE_ENABLED,
+            "backend": "redis" if self.shared else "memory",
+            "policies": {
+                policy.name: {"burst": policy.burst, "per_minute": policy.rate * 60}
+                for policy in (self.email_policy, self.client_policy)
+            },
+            "allowed": self.allowed,
+            "rejected": {
+                "email": self.rejected_email,
+                "client": self.rejected_client,
+                "total": self.rejected_email + self.rejected_client,
+            },
+            "reject_rate": round((self.rejected_email + self.rejected_client) / total, 4) if total else 0.0,
+            "tracked_keys": len(self.local.buckets),
+            "backend_errors": self.backend_errors,
+        }
+
+
+def client_address(request, trusted_proxies: int = LOGIN_THROTTLE_TRUSTED_PROXIES) -> str:
+    """
+    Caller address. Behind ``trusted_proxies`` proxies this is the
+    ``X-Forwarded-For`` hop appended by the outermost trusted proxy (counted
+    from the right); hops further left are client-supplied and ignored.
+    """
+    if trusted_proxies > 0:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            if len(hops) >= trusted_proxies:
+                return hops[-trusted_proxies]
+    return request.client.host if request.client else "unknown"
+
+
+# Global instance
+login_throttle = LoginThrottle(
+    email_policy=ThrottlePolicy("email", LOGIN_THROTTLE_EMAIL_BURST, LOGIN_THROTTLE_EMAIL_PER_MINUTE),
+    client_policy=ThrottlePolicy("client", LOGIN_THROTTLE_CLIENT_BURST, LOGIN_THROTTLE_CLIENT_PER_MINUTE),
+)
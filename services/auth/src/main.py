@@ -1,23 +1,48 @@
 """Auth Service - JWT-based authentication with FastAPI."""
 import os
+import hashlib
 from datetime import datetime, timedelta
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Query, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
 from passlib.context import CryptContext
 import jwt
 from sqlalchemy.orm import Session
+from sqlalchemy import select, func, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from dotenv import load_dotenv
 
 from src.database import get_db, init_db, User as DBUser, UserRole
 from src.kafka_producer import kafka_producer
+from src.queries import user_by_email, user_by_id
+from src.login_throttle import login_throttle, client_address
+from src.load_shedding import (
+    LoadShedder, LoadSheddingMiddleware, RoutePolicy,
+    PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_SHEDDABLE,
+)
 
 load_dotenv()
 
 app = FastAPI(title="Auth Service", version="1.1.0")
 
+# Cheap lookups keep flowing under load; bcrypt-heavy register/login are shed first
+load_shedder = LoadShedder([
+    RoutePolicy("health", ["*"], r"/health", priority=PRIORITY_CRITICAL),
+    RoutePolicy("metrics", ["GET"], r"/metrics/.*", priority=PRIORITY_CRITICAL),
+    RoutePolicy("me", ["GET"], r"/v1/auth/me", priority=PRIORITY_NORMAL),
+    RoutePolicy("user_lookup", ["GET"], r"/v1/users/[^/]+|/v1/auth/users/search", priority=PRIORITY_NORMAL),
+    RoutePolicy("user_batch", ["POST"], r"/v1/users/batch", priority=PRIORITY_NORMAL),
+    RoutePolicy("login", ["POST"], r"/v1/auth/login", priority=PRIORITY_SHEDDABLE, max_queue=16, queue_timeout=0.25),
+    RoutePolicy("register", ["POST"], r"/v1/auth/register", priority=PRIORITY_SHEDDABLE, max_queue=8, queue_timeout=0.25),
+    RoutePolicy("sync", ["*"], r"/v1/auth/sync/.*", priority=PRIORITY_SHEDDABLE, max_queue=1, queue_timeout=0.1),
+    RoutePolicy("default", ["*"], r".*", priority=PRIORITY_NORMAL),
+])
+app.add_middleware(LoadSheddingMiddleware, shedder=load_shedder)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -52,6 +77,27 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UserBatchRequest(BaseModel):
+    ids: List[int] = Field(..., max_length=500)
+
+class UserBatchResponse(BaseModel):
+    users: List[UserResponse]
+
+class VendorUser(BaseModel):
+    id: int
+    email: str
+
+class VendorUserChunk(BaseModel):
+    users: List[VendorUser]
+    next_after_id: Optional[int]
+
+class VendorUserDigest(BaseModel):
+    from_id: int
+    to_id: int
+    count: int
+    digest: Optional[str]
+    max_id: Optional[int]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -70,7 +116,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-        user = db.query(DBUser).filter(DBUser.id == int(user_id)).first()
+        user = user_by_id(db, int(user_id))
         if user is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
         return user
@@ -83,18 +129,34 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
 async def startup_event():
     init_db()
     await kafka_producer.start()
+    await login_throttle.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     await kafka_producer.stop()
+    await login_throttle.stop()
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "service": "auth"}
 
-@app.post("/v1/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
-    existing_user = db.query(DBUser).filter(DBUser.email == user_data.email).first()
+@app.get("/metrics/load-shedding")
+async def load_shedding_metrics():
+    """Per-route concurrency limits, queue depths and shed counters"""
+    return load_shedder.metrics()
+
+@app.get("/metrics/login-throttle")
+async def login_throttle_metrics():
+    """Login throttle policies and allow/reject counters"""
+    return login_throttle.metrics()
+
+# bcrypt and the sync session block, so handlers run them in the threadpool (plain
+# ``def`` handlers already do). The event loop stays free, requests queue in the
+# load-shedding limiter and its latency samples include the wait for a thread or
+# DB connection.
+
+def create_user(db: Session, user_data: UserRegister) -> DBUser:
+    existing_user = user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
     hashed_password = get_password_hash(user_data.password)
@@ -102,6 +164,17 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    return new_user
+
+def authenticate_user(db: Session, email: str, password: str) -> Optional[DBUser]:
+    user = user_by_email(db, email)
+    if not user or not verify_password(password, user.password_hash):
+        return None
+    return user
+
+@app.post("/v1/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+    new_user = await run_in_threadpool(create_user, db, user_data)
     
     # Publish vendor registration event to Kafka if user registered as vendor
     if user_data.role == UserRole.VENDOR:
@@ -110,10 +183,19 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     return UserResponse(id=str(new_user.id), email=new_user.email, role=new_user.role.value)
 
 @app.post("/v1/auth/login", response_model=Token)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(DBUser).filter(DBUser.email == credentials.email).first()
-    if not user or not verify_password(credentials.password, user.password_hash):
+async def login(credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
+    # Reject abusive bursts before spending a DB round-trip and a bcrypt hash on them
+    allowed, retry_after = await login_throttle.check(credentials.email, client_address(request))
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+    user = await run_in_threadpool(authenticate_user, db, credentials.email, credentials.password)
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    await login_throttle.succeeded(credentials.email)
     access_token = create_access_token(data={"sub": str(user.id), "email": user.email, "role": user.role.value})
     return Token(token=access_token)
 
@@ -122,17 +204,25 @@ async def get_me(current_user: DBUser = Depends(get_current_user)):
     return UserResponse(id=str(current_user.id), email=current_user.email, role=current_user.role.value)
 
 @app.get("/v1/users/{user_id}", response_model=UserResponse)
-async def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
+def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
     """Get user information by ID - used internally by other services"""
-    user = db.query(DBUser).filter(DBUser.id == user_id).first()
+    user = user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return UserResponse(id=str(user.id), email=user.email, role=user.role.value)
 
+@app.post("/v1/users/batch", response_model=UserBatchResponse)
+def get_users_by_ids(request: UserBatchRequest, db: Session = Depends(get_db)):
+    """Get several users by ID in one call - used internally by other services. Unknown IDs are omitted."""
+    if not request.ids:
+        return UserBatchResponse(users=[])
+    users = db.query(DBUser).filter(DBUser.id.in_(set(request.ids))).all()
+    return UserBatchResponse(users=[UserResponse(id=str(u.id), email=u.email, role=u.role.value) for u in users])
+
 @app.get("/v1/auth/users/search", response_model=UserResponse)
-async def search_user_by_email(email: str, db: Session = Depends(get_db)):
+def search_user_by_email(email: str, db: Session = Depends(get_db)):
     """Search user by email - used internally by other services"""
-    user = db.query(DBUser).filter(DBUser.email == email).first()
+    user = user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return UserResponse(id=str(user.id), email=user.email, role=user.role.value)
@@ -145,7 +235,7 @@ async def sync_vendors(db: Session = Depends(get_db)):
     """
     try:
         # Get all users with VENDOR role
-        vendors = db.query(DBUser).filter(DBUser.role == UserRole.VENDOR).all()
+        vendors = await run_in_threadpool(db.query(DBUser).filter(DBUser.role == UserRole.VENDOR).all)
         
         if not vendors:
             return {"message": "No vendors found to sync", "synced_count": 0}
@@ -174,6 +264,51 @@ async def sync_vendors(db: Session = Depends(get_db)):
             detail=f"Vendor sync failed: {str(e)}"
         )
 
+def vendor_users_digest(db: Session, from_id: int, to_id: int):
+    """
+    Count and md5 of ``"<id>:<email>"`` lines (ordered by id) for vendor users in
+    ``[from_id, to_id)``. Vendors service computes the same digest over its rows, so
+    equal digests mean the range needs no repair. Digest is None for an empty range.
+    """
+    in_range = (DBUser.role == UserRole.VENDOR, DBUser.id >= from_id, DBUser.id < to_id)
+    if db.bind.dialect.name == "postgresql":
+        line = func.concat(DBUser.id, ":", DBUser.email)
+        return db.execute(select(
+            func.count(),
+            func.md5(func.string_agg(line, aggregate_order_by(literal("\n"), DBUser.id))),
+        ).where(*in_range)).one()
+    lines = [f"{user_id}:{email}" for user_id, email in
+             db.execute(select(DBUser.id, DBUser.email).where(*in_range).order_by(DBUser.id))]
+    return len(lines), hashlib.md5("\n".join(lines).encode("utf-8")).hexdigest() if lines else None
+
+@app.get("/v1/auth/sync/vendors/chunk", response_model=VendorUserChunk)
+def vendor_users_chunk(
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    before_id: Optional[int] = Query(None, description="Stop before this id (exclusive)"),
+    db: Session = Depends(get_db)
+):
+    """Vendor users ordered by id, after ``after_id`` - used by vendors reconciliation"""
+    query = select(DBUser.id, DBUser.email).where(DBUser.role == UserRole.VENDOR, DBUser.id > after_id)
+    if before_id is not None:
+        query = query.where(DBUser.id < before_id)
+    rows = db.execute(query.order_by(DBUser.id).limit(limit)).all()
+    return VendorUserChunk(
+        users=[VendorUser(id=user_id, email=email) for user_id, email in rows],
+        next_after_id=rows[-1][0] if len(rows) == limit else None
+    )
+
+@app.get("/v1/auth/sync/vendors/digest", response_model=VendorUserDigest)
+def vendor_users_range_digest(
+    from_id: int = Query(0, ge=0),
+    to_id: int = Query(..., ge=0, description="Exclusive upper bound"),
+    db: Session = Depends(get_db)
+):
+    """Count and digest of vendor users in an id range - used by vendors reconciliation"""
+    count, digest = vendor_users_digest(db, from_id, to_id)
+    max_id = db.execute(select(func.max(DBUser.id)).where(DBUser.role == UserRole.VENDOR)).scalar()
+    return VendorUserDigest(from_id=from_id, to_id=to_id, count=count, digest=digest, max_id=max_id)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8001))
@@ -0,0 +1,226 @@
+"""Declarative hash partitioning for the ``users`` table.
+
+When ``USERS_PARTITIONS`` is set, ``users`` is created as a Postgres table
+partitioned by ``HASH (id)``. Postgres only allows unique indexes on a
+partitioned table if they include the partition key, so email uniqueness is
+enforced by the narrow ``user_emails (email PRIMARY KEY, user_id)`` table,
+kept in sync by a trigger on ``users``. A duplicate email still fails the
+insert with a unique violation (``IntegrityError``), exactly as before.
+
+Lookups by id prune to a single partition. Lookups by email first resolve the
+id through ``user_emails`` and then hit one partition; use
+``user_email_clause`` instead of filtering on ``User.email`` directly.
+
+Migration tooling (run with writes stopped)::
+
+    python -m src.partitioning status
+    python -m src.partitioning create --partitions 16
+    python -m src.partitioning migrate --partitions 16 --batch-size 50000
+    python -m src.partitioning rollback
+
+``migrate`` can be re-run after a failure: it continues copying after the
+highest id already in the partitioned table. ``rollback`` drops the
+partitioned table and restores ``users_unpartitioned``, discarding anything
+written to the partitioned table.
+"""
+import os
+import argparse
+from sqlalchemy import MetaData, Table, Column, String, BigInteger, select, text
+from sqlalchemy.engine import Engine
+
+USERS_PARTITIONS = int(os.getenv("USERS_PARTITIONS", "0"))  # 0 keeps the single table
+
+guard_metadata = MetaData()
+
+user_emails = Table(
+    "user_emails",
+    guard_metadata,
+    Column("email", String, primary_key=True),
+    Column("user_id", BigInteger, nullable=False),
+)
+
+# Set by init_partitioning() from the live schema, not from configuration
+enabled = False
+
+
+def partitioned_ddl(partitions: int, role_values) -> list:
+    """DDL for the partitioned ``users`` table, its partitions and the email guard."""
+    enum_values = ", ".join(f"'{value}'" for value in role_values)
+    statements = [
+        f"""DO $$ BEGIN
+            CREATE TYPE userrole AS ENUM ({enum_values});
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$""",
+        "CREATE SEQUENCE IF NOT EXISTS users_id_seq",
+        """CREATE TABLE users (
+            id BIGINT NOT NULL DEFAULT nextval('users_id_seq'),
+            email VARCHAR NOT NULL,
+            password_hash VARCHAR NOT NULL,
+            role userrole NOT NULL,
+            PRIMARY KEY (id)
+        ) PARTITION BY HASH (id)""",
+        "ALTER SEQUENCE users_id_seq OWNED BY users.id",
+        """CREATE TABLE IF NOT EXISTS user_emails (
+            email VARCHAR PRIMARY KEY,
+            user_id BIGINT NOT NULL
+        )""",
+        """CREATE OR REPLACE FUNCTION users_email_guard() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND NEW.email IS DISTINCT FROM OLD.email) THEN
+                DELETE FROM user_emails WHERE email = OLD.email AND user_id = OLD.id;
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.email IS DISTINCT FROM OLD.email) THEN
+                INSERT INTO user_emails (email, user_id) VALUES (NEW.email, NEW.id);
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql""",
+        """CREATE TRIGGER users_email_guard
+            AFTER INSERT OR UPDATE OF email OR DELETE ON users
+            FOR EACH ROW EXECUTE FUNCTION users_email_guard()""",
+    ]
+    for remainder in range(partitions):
+        statements.append(
+            f"CREATE TABLE users_p{remainder} PARTITION OF users "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    return statements
+
+
+def table_exists(conn, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def is_partitioned(engine: Engine) -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('users'))"
+        )).scalar()
+
+
+def create_partitioned_users(engine: Engine, partitions: int, role_values):
+    """Create the partitioned schema if ``users`` does not exist yet."""
+    with engine.begin() as conn:
+        if table_exists(conn, "users"):
+            return False
+        for statement in partitioned_ddl(partitions, role_values):
+            conn.execute(text(statement))
+    print(f"✅ Created users table with {partitions} hash partitions")
+    return True
+
+
+def migrate_to_partitioned(engine: Engine, partitions: int, role_values, batch_size: int = 50000):
+    """
+    Move an existing single ``users`` table into a partitioned one.
+    The old table is kept as ``users_unpartitioned`` for rollback. If it
+    already exists, an earlier run was interrupted and copying resumes.
+    """
+    with engine.begin() as conn:
+        resuming = table_exists(conn, "users_unpartitioned")
+        if not resuming:
+            # Detach the sequence so it survives if the old table is dropped later
+            conn.execute(text("ALTER SEQUENCE users_id_seq OWNED BY NONE"))
+            conn.execute(text("ALTER TABLE users RENAME TO users_unpartitioned"))
+            conn.execute(text("ALTER TABLE users_unpartitioned RENAME CONSTRAINT users_pkey TO users_unpartitioned_pkey"))
+            for statement in partitioned_ddl(partitions, role_values):
+                conn.execute(text(statement))
+        last_id = conn.execute(text("SELECT COALESCE(max(id), 0) FROM users")).scalar()
+    if resuming:
+        print(f"  resuming copy after id {last_id}")
+
+    copied = 0
+    while True:
+        # One transaction per batch keeps locks and WAL bursts bounded
+        with engine.begin() as conn:
+            row = conn.execute(text("""
+                WITH batch AS (
+                    INSERT INTO users (id, email, password_hash, role)
+                    SELECT id, email, password_hash, role FROM users_unpartitioned
+                    WHERE id > :last_id ORDER BY id LIMIT :batch_size
+                    RETURNING id
+                )
+                SELECT count(*), max(id) FROM batch
+            """), {"last_id": last_id, "batch_size": batch_size}).one()
+        if not row[0]:
+            break
+        copied += row[0]
+        last_id = row[1]
+        print(f"  copied {copied} users (last id {last_id})")
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "SELECT setval('users_id_seq', GREATEST((SELECT COALESCE(max(id), 0) FROM users), 1))"
+        ))
+        conn.execute(text("ANALYZE users"))
+    print(f"✅ Migrated {copied} users into {partitions} hash partitions")
+    return copied
+
+
+def rollback_partitioned(engine: Engine):
+    """Drop the partitioned ``users`` table and put ``users_unpartitioned`` back."""
+    with engine.begin() as conn:
+        if not table_exists(conn, "users_unpartitioned"):
+            raise RuntimeError("users_unpartitioned does not exist; nothing to roll back")
+        # The sequence is owned by the partitioned table; keep it when dropping that
+        conn.execute(text("ALTER SEQUENCE users_id_seq OWNED BY NONE"))
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text("DROP TABLE IF EXISTS user_emails"))
+        conn.execute(text("DROP FUNCTION IF EXISTS users_email_guard()"))
+        conn.execute(text("ALTER TABLE users_unpartitioned RENAME TO users"))
+        conn.execute(text("ALTER TABLE users RENAME CONSTRAINT users_unpartitioned_pkey TO users_pkey"))
+        conn.execute(text("ALTER SEQUENCE users_id_seq OWNED BY users.id"))
+        conn.execute(text(
+            "SELECT setval('users_id_seq', GREATEST((SELECT COALESCE(max(id), 0) FROM users), 1))"
+        ))
+    print("✅ Restored the single users table")
+
+
+def init_partitioning(engine: Engine, role_values):
+    """Create the partitioned schema when configured and detect the live layout."""
+    global enabled
+    if engine.dialect.name != "postgresql":
+        return
+    if USERS_PARTITIONS > 0:
+        create_partitioned_users(engine, USERS_PARTITIONS, role_values)
+    enabled = is_partitioned(engine)
+
+
+def user_email_clause(user_model, email: str, partitioned: bool = None):
+    """Filter clause for a user lookup by email that prunes to one partition."""
+    if partitioned is None:
+        partitioned = enabled
+    if not partitioned:
+        return user_model.email == email
+    user_id = select(user_emails.c.user_id).where(user_emails.c.email == email).scalar_subquery()
+    return user_model.id == user_id
+
+
+def main():
+    from src.database import engine, UserRole
+
+    parser = argparse.ArgumentParser(description="Manage hash partitioning of the users table")
+    parser.add_argument("command", choices=["status", "create", "migrate", "rollback"])
+    parser.add_argument("--partitions", type=int, default=USERS_PARTITIONS or 16)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    role_values = [role.name for role in UserRole]
+    if args.command == "status":
+        print("partitioned" if is_partitioned(engine) else "single table")
+    elif args.command == "create":
+        if not create_partitioned_users(engine, args.partitions, role_values):
+            print("users table already exists; use 'migrate' to convert it")
+    elif args.command == "migrate":
+        with engine.connect() as conn:
+            interrupted = table_exists(conn, "users_unpartitioned")
+        if is_partitioned(engine) and not interrupted:
+            print("users is already partitioned")
+            return
+        migrate_to_partitioned(engine, args.partitions, role_values, args.batch_size)
+    elif args.command == "rollback":
+        rollback_partitioned(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Prebuilt statements for the Auth service hot paths.
+
+``login``, ``register`` and ``get_current_user`` run the same lookups on every
+request. Building them with ``db.query(...).filter(...)`` each time costs
+Python work: constructing the query and computing its cache key. The
+statements here are built once at import with bound parameters, so each call
+only binds values and reuses the compiled SQL. On the psycopg 3 driver the
+identical SQL text also lets Postgres reuse a server-side prepared statement
+(see ``DB_PREPARE_THRESHOLD`` in ``database.py``).
+"""
+from typing import Optional
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from src.database import User
+from src import partitioning
+
+
+def _layouts(build):
+    """Prebuild a statement for the single-table and partitioned layouts."""
+    return {False: build(False), True: build(True)}
+
+
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+USER_BY_EMAIL = _layouts(lambda partitioned: select(User).where(
+    partitioning.user_email_clause(User, bindparam("email"), partitioned)
+))
+
+
+def user_by_id(db: Session, user_id: int) -> Optional[User]:
+    return db.execute(USER_BY_ID, {"user_id": user_id}).scalar_one_or_none()
+
+
+def user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.execute(USER_BY_EMAIL[partitioning.enabled], {"email": email}).scalar_one_or_none()
@@ -0,0 +1,151 @@
+"""Benchmark: single ``vendors`` table vs hash-partitioned ``vendors``.
+
+Loads the same number of rows into both layouts (each in its own schema of the
+target database), then measures single-row insert latency and point-lookup
+latency by id, email and user_id using the same queries the service runs.
+
+    python scripts/bench_partitioning.py --rows 10000000 --partitions 16
+
+Run from ``services/vendors`` against a disposable Postgres database; the
+``bench_single`` and ``bench_partitioned`` schemas are dropped and recreated.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, insert, select, text  # noqa: E402
+
+from src.database import Base, Vendor  # noqa: E402
+from src.partitioning import partitioned_ddl, vendor_email_clause, vendor_user_id_clause  # noqa: E402
+
+LOAD_CHUNK = 1_000_000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples):
+    return {
+        "p50": percentile(samples, 50) * 1000,
+        "p95": percentile(samples, 95) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "mean": statistics.fmean(samples) * 1000,
+    }
+
+
+def layout_engine(url: str, schema: str):
+    return create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+
+
+def prepare(url: str, schema: str, partitions: int, rows: int):
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    admin.dispose()
+
+    engine = layout_engine(url, schema)
+    if partitions:
+        with engine.begin() as conn:
+            for statement in partitioned_ddl(partitions):
+                conn.execute(text(statement))
+    else:
+        Base.metadata.create_all(bind=engine, tables=[Vendor.__table__])
+
+    start = time.perf_counter()
+    for offset in range(0, rows, LOAD_CHUNK):
+        upper = min(rows, offset + LOAD_CHUNK)
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO vendors (user_id, name, email, phone)
+                SELECT g::text, 'Vendor ' || g, 'vendor' || g || '@bench.local', NULL
+                FROM generate_series(:lower, :upper) AS g
+            """), {"lower": offset + 1, "upper": upper})
+        print(f"  [{schema}] loaded {upper}/{rows} rows")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"  [{schema}] bulk load took {time.perf_counter() - start:.1f}s")
+    return engine
+
+
+def measure(engine, partitioned: bool, rows: int, samples: int):
+    results = {}
+
+    insert_times = []
+    with engine.connect() as conn:
+        for i in range(samples):
+            statement = insert(Vendor).values(
+                name=f"New {i}", email=f"new{i}-{time.time_ns()}@bench.local", version=1
+            )
+            start = time.perf_counter()
+            conn.execute(statement)
+            conn.commit()
+            insert_times.append(time.perf_counter() - start)
+    results["insert"] = summarize(insert_times)
+
+    ids = [random.randint(1, rows) for _ in range(samples)]
+    by_id, by_email, by_user_id = [], [], []
+    with engine.connect() as conn:
+        for vendor_id in ids:
+            start = time.perf_counter()
+            conn.execute(select(Vendor).where(Vendor.id == vendor_id)).first()
+            by_id.append(time.perf_counter() - start)
+        for vendor_id in ids:
+            email = f"vendor{vendor_id}@bench.local"
+            start = time.perf_counter()
+            row = conn.execute(select(Vendor).where(vendor_email_clause(Vendor, email, partitioned))).first()
+            by_email.append(time.perf_counter() - start)
+            assert row is not None, email
+        for vendor_id in ids:
+            start = time.perf_counter()
+            row = conn.execute(select(Vendor).where(vendor_user_id_clause(Vendor, vendor_id, partitioned))).first()
+            by_user_id.append(time.perf_counter() - start)
+            assert row is not None, vendor_id
+    results["lookup_by_id"] = summarize(by_id)
+    results["lookup_by_email"] = summarize(by_email)
+    results["lookup_by_user"] = summarize(by_user_id)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark schemas afterwards")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    report = {}
+    for schema, partitions in (("bench_single", 0), ("bench_partitioned", args.partitions)):
+        print(f"Preparing {schema} ({args.rows} rows)...")
+        engine = prepare(args.database_url, schema, partitions, args.rows)
+        report[schema] = measure(engine, bool(partitions), args.rows, args.samples)
+        engine.dispose()
+
+    print(f"\nLatency in ms ({args.rows} rows, {args.partitions} partitions, {args.samples} samples)")
+    print(f"{'operation':<18}{'layout':<20}{'p50':>8}{'p95':>8}{'p99':>8}{'mean':>8}")
+    for operation in ("insert", "lookup_by_id", "lookup_by_email", "lookup_by_user"):
+        for schema, results in report.items():
+            stats = results[operation]
+            print(f"{operation:<18}{schema:<20}{stats['p50']:>8.3f}{stats['p95']:>8.3f}"
+                  f"{stats['p99']:>8.3f}{stats['mean']:>8.3f}")
+
+    if not args.keep:
+        admin = create_engine(args.database_url)
+        with admin.begin() as conn:
+            for schema in report:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
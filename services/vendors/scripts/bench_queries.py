@@ -0,0 +1,69 @@
+"""Micro-benchmark: per-request Python overhead of the ``get_vendor`` lookup.
+
+Compares the previous ``db.query(Vendor).filter(Vendor.id == id).first()``
+against the prebuilt statement in ``src.queries``. The default target is an
+in-memory SQLite database so the numbers are dominated by Python-side query
+construction, cache-key generation and result handling rather than by I/O.
+
+    python scripts/bench_queries.py --iterations 20000
+    python scripts/bench_queries.py --database-url postgresql+psycopg://...
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from src.database import Base, Vendor  # noqa: E402
+from src.queries import vendor_by_id, vendor_by_email  # noqa: E402
+from src.partitioning import vendor_email_clause  # noqa: E402
+
+VENDOR_ID = 1
+VENDOR_EMAIL = "bench-vendor@example.com"
+
+
+def timed(label: str, fn, iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        fn()  # warm SQLAlchemy's compiled cache and the connection
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations * 1e6
+    print(f"  {label:<34}{per_call:>9.1f} us/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine, tables=[Vendor.__table__])
+    with Session(engine) as db:
+        if vendor_by_id(db, VENDOR_ID) is None:
+            db.add(Vendor(id=VENDOR_ID, name="Bench Vendor", email=VENDOR_EMAIL))
+            db.commit()
+
+    with Session(engine) as db:
+        print("get_vendor: lookup by id")
+        legacy = timed("db.query(...).filter(...).first()",
+                       lambda: db.query(Vendor).filter(Vendor.id == VENDOR_ID).first(), args.iterations)
+        cached = timed("queries.vendor_by_id()", lambda: vendor_by_id(db, VENDOR_ID), args.iterations)
+        print(f"  saved {legacy - cached:.1f} us/request ({(legacy - cached) / legacy:.0%})")
+
+        print("create/update_vendor: lookup by email")
+        legacy = timed("db.query(...).filter(...).first()",
+                       lambda: db.query(Vendor).filter(vendor_email_clause(Vendor, VENDOR_EMAIL)).first(),
+                       args.iterations)
+        cached = timed("queries.vendor_by_email()", lambda: vendor_by_email(db, VENDOR_EMAIL), args.iterations)
+        print(f"  saved {legacy - cached:.1f} us/request ({(legacy - cached) / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark: typeahead latency and memory of the in-memory vendor prefix index.
+
+Builds ``VendorPrefixIndex`` from synthetic vendors (no database needed),
+then times ``suggest()`` for random 1-4 character prefixes and reports the
+p50/p99 latency, the memory measured with ``tracemalloc`` and the index's own
+estimate from ``/metrics/suggest``.
+
+    python scripts/bench_suggest.py --vendors 1000000 --queries 100000
+"""
+import os
+import sys
+import time
+import random
+import string
+import argparse
+import tracemalloc
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.suggest import VendorPrefixIndex, index_keys  # noqa: E402
+
+WORDS = ["acme", "sunrise", "catering", "sound", "lighting", "events", "floral", "studio",
+         "decor", "rentals", "audio", "stage", "party", "gourmet", "photo", "royal"]
+
+
+def synthetic_vendors(count: int):
+    rng = random.Random(42)
+    for vendor_id in range(1, count + 1):
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+        email = f"{''.join(rng.choices(string.ascii_lowercase, k=8))}{vendor_id}@example.com"
+        yield vendor_id, name, email, str(vendor_id) if vendor_id % 2 else None
+
+
+def build(count: int) -> VendorPrefixIndex:
+    """Same single-pass build as ``VendorPrefixIndex.load`` without the database."""
+    index = VendorPrefixIndex(max_vendors=count)
+    entries = []
+    for vendor_id, name, email, user_id in synthetic_vendors(count):
+        keys = index_keys(name, email)
+        index.vendors[vendor_id] = (name, email, user_id, 1, keys)
+        if user_id is not None:
+            index.by_user_id[user_id] = vendor_id
+        entries.extend((key, vendor_id) for key in keys)
+    entries.sort()
+    index.keys = [key for key, _ in entries]
+    index.ids = array("q", (vendor_id for _, vendor_id in entries))
+    index.ready = True
+    return index
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vendors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = build(args.vendors)
+    build_seconds = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rng = random.Random(7)
+    alphabet = string.ascii_lowercase
+    prefixes = [rng.choice(WORDS)[:rng.randint(1, 4)] if rng.random() < 0.7
+                else "".join(rng.choices(alphabet, k=rng.randint(1, 4)))
+                for _ in range(args.queries)]
+    latencies = []
+    for prefix in prefixes:
+        t = time.perf_counter()
+        index.suggest(prefix, args.limit)
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+
+    stats = index.stats()
+    print(f"vendors: {stats['vendors']}  keys: {stats['keys']}  build: {build_seconds:.1f}s")
+    print(f"memory (tracemalloc): {traced / 2**20:.0f} MiB"
+          f"  ({traced / args.vendors * 1_000_000 / 2**20:.0f} MiB per million vendors)")
+    print(f"memory (index estimate): {stats['memory_bytes'] / 2**20:.0f} MiB")
+    print(f"suggest latency over {args.queries} queries:"
+          f"  p50 {percentile(latencies, 0.50) * 1e6:.1f} us"
+          f"  p99 {percentile(latencies, 0.99) * 1e6:.1f} us"
+          f"  max {latencies[-1] * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
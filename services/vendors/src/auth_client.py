@@ -0,0 +1,163 @@
+"""Pooled HTTP client for Auth service lookups from Vendors service.
+
+A single ``httpx.AsyncClient`` is created at startup and reused for every
+call, so connections to auth stay alive instead of being opened per request.
+Idempotent calls are retried on transport errors and 5xx responses with
+exponential backoff and full jitter.
+
+``resolve_user`` caches results (including "not found" for a shorter time)
+and coalesces lookups: concurrent callers asking for the same id share one
+future, and ids requested within a short window are fetched together with a
+single ``POST /v1/users/batch`` call.
+"""
+import os
+import time
+import random
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+import httpx
+
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
+AUTH_CLIENT_TIMEOUT = float(os.getenv("AUTH_CLIENT_TIMEOUT", "2.0"))
+AUTH_CLIENT_MAX_CONNECTIONS = int(os.getenv("AUTH_CLIENT_MAX_CONNECTIONS", "50"))
+AUTH_CLIENT_RETRIES = int(os.getenv("AUTH_CLIENT_RETRIES", "2"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_NEGATIVE_TTL = float(os.getenv("AUTH_USER_NEGATIVE_TTL", "10"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_BATCH_WINDOW_MS = float(os.getenv("AUTH_BATCH_WINDOW_MS", "2"))
+AUTH_BATCH_MAX = int(os.getenv("AUTH_BATCH_MAX", "100"))
+
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+
+
+class AuthServiceUnavailable(Exception):
+    """Auth service could not be reached or kept failing after retries."""
+
+
+class AuthClient:
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.cache: "OrderedDict[int, tuple]" = OrderedDict()  # user_id -> (expires_at, user or None)
+        self.inflight: Dict[int, asyncio.Future] = {}
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_tasks: Set[asyncio.Task] = set()  # full batches being fetched
+
+        self.cache_hits = 0
+        self.batches = 0
+
+    async def start(self):
+        """Create the shared connection pool"""
+        self.client = httpx.AsyncClient(
+            base_url=AUTH_SERVICE_URL,
+            http2=True,
+            timeout=httpx.Timeout(AUTH_CLIENT_TIMEOUT, connect=1.0),
+            limits=httpx.Limits(
+                max_connections=AUTH_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=AUTH_CLIENT_MAX_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+        )
+        print(f"[Auth] HTTP client pool ready for {AUTH_SERVICE_URL}")
+
+    async def stop(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying transport errors and 5xx responses with jittered backoff."""
+        if self.client is None:
+            raise AuthServiceUnavailable("Auth client is not started")
+        last_error = None
+        for attempt in range(AUTH_CLIENT_RETRIES + 1):
+            if attempt:
+                delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                last_error = e
+                continue
+            if response.status_code < 500:
+                return response
+            last_error = f"HTTP {response.status_code}"
+        raise AuthServiceUnavailable(f"{method} {url} failed: {last_error}")
+
+    def _cached(self, user_id: int):
+        entry = self.cache.get(user_id)
+        if entry is None:
+            return False, None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self.cache[user_id]
+            return False, None
+        self.cache.move_to_end(user_id)
+        return True, user
+
+    def _store(self, user_id: int, user: Optional[dict]):
+        ttl = AUTH_USER_CACHE_TTL if user is not None else AUTH_USER_NEGATIVE_TTL
+        self.cache[user_id] = (time.monotonic() + ttl, user)
+        self.cache.move_to_end(user_id)
+        if len(self.cache) > AUTH_USER_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    async def resolve_user(self, user_id) -> Optional[dict]:
+        """
+        Look up an auth user by id. Returns ``{"id", "email", "role"}`` or None if
+        the user does not exist; raises ``AuthServiceUnavailable`` if auth is down.
+        """
+        user_id = int(user_id)
+        hit, user = self._cached(user_id)
+        if hit:
+            self.cache_hits += 1
+            return user
+        future = self.inflight.get(user_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.inflight[user_id] = future
+            self.pending[user_id] = future
+            if len(self.pending) >= AUTH_BATCH_MAX:
+                # Own task, so cancelling this caller cannot strand the other waiters
+                task = asyncio.create_task(self._flush())
+                self.flush_tasks.add(task)
+                task.add_done_callback(self.flush_tasks.discard)
+            elif self.flush_task is None:
+                self.flush_task = asyncio.create_task(self._flush_after_window())
+        # Shield so one cancelled caller does not cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(AUTH_BATCH_WINDOW_MS / 1000)
+        self.flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        self.batches += 1
+        try:
+            response = await self.request("POST", "/v1/users/batch", json={"ids": list(batch)})
+            response.raise_for_status()
+            found = {int(user["id"]): user for user in response.json()["users"]}
+            for user_id, future in batch.items():
+                user = found.get(user_id)
+                self._store(user_id, user)
+                if not future.done():
+                    future.set_result(user)
+        except Exception as e:
+            error = e if isinstance(e, AuthServiceUnavailable) else AuthServiceUnavailable(str(e))
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+                    future.exception()  # mark retrieved; callers may have gone away
+        finally:
+            for user_id in batch:
+                self.inflight.pop(user_id, None)
+
+
+# Global instance
+auth_client = AuthClient()
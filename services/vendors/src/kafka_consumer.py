@@ -2,12 +2,17 @@
 import os
 import json
 import asyncio
-from aiokafka import AIOKafkaConsumer
+from aiokafka import AIOKafkaConsumer, TopicPartition
 from sqlalchemy.orm import Session
 from src.database import SessionLocal, Vendor as DBVendor
+from src.outbox import record_vendor_changed, VENDOR_CHANGES_TOPIC
+from src.suggest import vendor_index
+from src.queries import vendor_by_user_id_or_email
+from src.auth_client import auth_client, AuthServiceUnavailable
 
 KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
 KAFKA_GROUP_ID = "vendors-service-group"
+VENDOR_CHANGES_RECONNECT_MAX_DELAY = float(os.getenv("VENDOR_CHANGES_RECONNECT_MAX_DELAY", "30"))
 
 async def consume_vendor_registrations():
     """
@@ -42,19 +47,28 @@ async def consume_vendor_registrations():
                 
                 print(f"[Kafka] 📧 Received vendor registration: user_id={user_id}, email={email}")
                 
+                # Skip stale events (e.g. replays of sync) for users that no longer exist.
+                # If auth is unreachable, trust the event: it was published by auth itself.
+                try:
+                    if await auth_client.resolve_user(user_id) is None:
+                        print(f"[Kafka] ⚠️  Skipping registration for unknown user_id={user_id}")
+                        continue
+                except AuthServiceUnavailable as e:
+                    print(f"[Kafka] ⚠️  Could not verify user_id={user_id} with auth: {e}")
+                
                 # Create vendor profile in database
                 db = SessionLocal()
                 try:
                     # Check if vendor already exists
-                    existing_vendor = db.query(DBVendor).filter(
-                        (DBVendor.user_id == user_id) | (DBVendor.email == email)
-                    ).first()
+                    existing_vendor = vendor_by_user_id_or_email(db, user_id, email)
                     
                     if existing_vendor:
                         if existing_vendor.user_id is None and existing_vendor.email == email:
                             # Vendor was pre-created by organizer, link to user_id
                             existing_vendor.user_id = user_id
+                            record_vendor_changed(db, existing_vendor)
                             db.commit()
+                            vendor_index.upsert_vendor(existing_vendor)
                             print(f"[Kafka] ✅ Linked existing vendor (id={existing_vendor.id}) to user_id={user_id}")
                         else:
                             print(f"[Kafka] ℹ️  Vendor already exists: {email}")
@@ -67,8 +81,10 @@ async def consume_vendor_registrations():
                             phone=None
                         )
                         db.add(new_vendor)
+                        record_vendor_changed(db, new_vendor)
                         db.commit()
                         db.refresh(new_vendor)
+                        vendor_index.upsert_vendor(new_vendor)
                         print(f"[Kafka] ✅ Auto-created vendor profile: id={new_vendor.id}, user_id={user_id}, email={email}")
                 
                 except Exception as db_error:
@@ -87,6 +103,71 @@ async def consume_vendor_registrations():
         await consumer.stop()
         print("[Kafka] Consumer stopped")
 
+async def consume_vendor_changes(ready: asyncio.Event):
+    """
+    Apply ``vendor.changes`` events to the typeahead index so writes handled by
+    other replicas become visible here. Every replica reads every partition
+    (no consumer group) starting from the current end; ``ready`` is set once
+    the start offsets are fixed, so the index snapshot loaded afterwards
+    cannot miss an event.
+
+    On any error the listener reconnects with backoff. Events published while
+    it was away are not replayed; instead the index is reloaded from the
+    database once the new start offsets are fixed, as at startup.
+    """
+    delay = 1.0
+    reload_needed = False  # startup loads the first snapshot
+    while True:
+        consumer = AIOKafkaConsumer(
+            bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+            group_id=None,
+            value_deserializer=lambda m: json.loads(m.decode('utf-8')) if m is not None else None,
+            enable_auto_commit=False
+        )
+        try:
+            await consumer.start()
+            await consumer.topics()  # load metadata
+            partitions = consumer.partitions_for_topic(VENDOR_CHANGES_TOPIC) or set()
+            assigned = [TopicPartition(VENDOR_CHANGES_TOPIC, p) for p in partitions]
+            consumer.assign(assigned)
+            if assigned:
+                await consumer.seek_to_end(*assigned)
+                for tp in assigned:
+                    await consumer.position(tp)  # resolve the end offsets now
+            if reload_needed:
+                print("[Kafka] Reloading typeahead index after a gap in vendor changes")
+                vendor_index.install(await asyncio.to_thread(snapshot_vendor_index))
+                reload_needed = False
+            ready.set()
+            delay = 1.0
+            print(f"[Kafka] Listening for vendor changes on '{VENDOR_CHANGES_TOPIC}' ({len(assigned)} partitions)")
+            
+            async for message in consumer:
+                if message.value is None:
+                    continue  # tombstone after vendor.deleted, already applied
+                try:
+                    vendor_index.apply_event(message.value)
+                except Exception as e:
+                    print(f"[Kafka] ❌ Error applying vendor change: {e}")
+        
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Kafka] ❌ Vendor change listener error, reconnecting in {delay:.0f}s: {e}")
+        finally:
+            ready.set()
+            await consumer.stop()
+        reload_needed = True
+        await asyncio.sleep(delay)
+        delay = min(VENDOR_CHANGES_RECONNECT_MAX_DELAY, delay * 2)
+
+def snapshot_vendor_index():
+    db = SessionLocal()
+    try:
+        return vendor_index.snapshot(db)
+    finally:
+        db.close()
+
 def start_kafka_consumer():
     """Start Kafka consumer in background task."""
     try:
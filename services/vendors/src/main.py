@@ -1,17 +1,42 @@
 import os
 from fastapi import FastAPI, HTTPException, Depends, status, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from typing import List, Dict, Optional, Any
 import jwt
+import asyncio
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy import or_, and_, asc, desc
 from dotenv import load_dotenv
-from src.database import get_db, init_db, Vendor as DBVendor
+from src.database import get_db, init_db, SessionLocal, Vendor as DBVendor, ReconcileRun
+from src.outbox import outbox_relay, record_vendor_changed, record_vendor_deleted
+from src.partitioning import vendor_user_id_clause
+from src.queries import vendor_by_id, vendor_by_email, vendor_by_user_id
+from src.auth_client import auth_client, AuthServiceUnavailable
+from src.suggest import vendor_index, suggest_from_db
+from src.reconcile import start_reconcile, reconcile_lock
+from src.load_shedding import (
+    LoadShedder, LoadSheddingMiddleware, RoutePolicy,
+    PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_SHEDDABLE,
+)
 import math
 
 load_dotenv()
 app = FastAPI(title="Vendors Service", version="1.1.0")
+# Point reads by id are cheap and stay available; list scans and writes are shed first
+load_shedder = LoadShedder([
+    RoutePolicy("health", ["*"], r"/health", priority=PRIORITY_CRITICAL),
+    RoutePolicy("metrics", ["GET"], r"/metrics/.*", priority=PRIORITY_CRITICAL),
+    RoutePolicy("suggest", ["GET"], r"/v1/vendors/suggest", priority=PRIORITY_NORMAL, max_queue=64, queue_timeout=0.05),
+    RoutePolicy("get_vendor", ["GET"], r"/v1/vendors/\d+", priority=PRIORITY_NORMAL),
+    RoutePolicy("list_vendors", ["GET"], r"/v1/vendors", priority=PRIORITY_SHEDDABLE, max_queue=16, queue_timeout=0.25),
+    RoutePolicy("reconcile", ["POST"], r"/v1/vendors/reconcile", priority=PRIORITY_SHEDDABLE, max_queue=1, queue_timeout=0.1),
+    RoutePolicy("write_vendor", ["POST", "PATCH", "DELETE"], r"/v1/vendors(/\d+)?", priority=PRIORITY_SHEDDABLE, max_queue=8, queue_timeout=0.25),
+    RoutePolicy("default", ["*"], r".*", priority=PRIORITY_NORMAL),
+])
+app.add_middleware(LoadSheddingMiddleware, shedder=load_shedder)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-jwt-key-change-in-production")
 ALGORITHM = "HS256"
@@ -46,6 +71,15 @@ class PaginatedVendorResponse(BaseModel):
         # Allow arbitrary types and don't validate the vendors list structure
         arbitrary_types_allowed = True
 
+class VendorSuggestion(BaseModel):
+    id: str
+    name: Optional[str]
+    email: str
+
+class VendorSuggestResponse(BaseModel):
+    prefix: str
+    suggestions: List[VendorSuggestion]
+
 class VendorFilter(BaseModel):
     name: Optional[str] = None
     email: Optional[str] = None
@@ -141,17 +175,47 @@ def build_pagination_info(page: int, page_size: int, total_count: int) -> dict:
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    await auth_client.start()
+    # The relay also creates the vendor.changes topic the index listener reads
+    await outbox_relay.start()
+    # Fix the change-stream start offsets before taking the index snapshot
+    from src.kafka_consumer import start_kafka_consumer, consume_vendor_changes
+    listener_ready = asyncio.Event()
+    asyncio.create_task(consume_vendor_changes(listener_ready))
+    try:
+        await asyncio.wait_for(listener_ready.wait(), timeout=10)
+    except asyncio.TimeoutError:
+        print("[Startup] ⚠️  Vendor change listener not ready, typeahead only sees local writes")
+    db = SessionLocal()
+    try:
+        vendor_index.load(db)
+    finally:
+        db.close()
     # Start Kafka consumer for vendor auto-creation
-    from src.kafka_consumer import start_kafka_consumer
     start_kafka_consumer()
     print("[Startup] Kafka consumer started for vendor auto-creation")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await outbox_relay.stop()
+    await auth_client.stop()
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "service": "vendors"}
 
+@app.get("/metrics/load-shedding")
+async def load_shedding_metrics():
+    """Per-route concurrency limits, queue depths and shed counters"""
+    return load_shedder.metrics()
+
+@app.get("/metrics/suggest")
+async def suggest_metrics():
+    """Typeahead index size and estimated memory footprint"""
+    return vendor_index.stats()
+
 @app.get("/v1/vendors", response_model=PaginatedVendorResponse)
-async def list_vendors(
+def list_vendors(
     page: int = Query(1, ge=1, description="Page number (starts from 1)"),
     page_size: int = Query(10, ge=1, le=100, description="Number of vendors per page"),
     sort_by: str = Query("id", description="Field to sort by (id, name, email, phone)"),
@@ -198,7 +262,7 @@ async def list_vendors(
     
     # Vendors can only see their own profile
     if user_role == "vendor":
-        query = query.filter(DBVendor.user_id == user_id)
+        query = query.filter(vendor_user_id_clause(DBVendor, user_id))
     
     # Apply filters
     query = apply_filters(query, filters)
@@ -251,36 +315,63 @@ async def list_vendors(
         sorting=sorting_info
     )
 
-@app.post("/v1/vendors", response_model=VendorResponse, status_code=status.HTTP_201_CREATED)
-async def create_vendor(vendor_data: VendorCreate, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
-    """Create a new vendor (global vendor catalog). Only admins can manually create vendors.
-    Vendors are typically auto-created when users register with role='vendor'.
-    """
-    
+# Sync session work runs in the threadpool (plain ``def`` handlers already do), so
+# the event loop stays free, requests queue in the load-shedding limiter and its
+# latency samples include the wait for a thread or DB connection. Handlers that
+# touch ``vendor_index`` stay async and update it on the loop.
+
+def check_new_vendor(db: Session, vendor_data: VendorCreate):
     # Check if vendor with email already exists
-    existing = db.query(DBVendor).filter(DBVendor.email == vendor_data.email).first()
+    existing = vendor_by_email(db, vendor_data.email)
     if existing:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Vendor with this email already exists")
     
     # Check if user_id is provided and if it's already linked to another vendor
     if vendor_data.user_id:
-        existing_by_user_id = db.query(DBVendor).filter(DBVendor.user_id == vendor_data.user_id).first()
+        existing_by_user_id = vendor_by_user_id(db, vendor_data.user_id)
         if existing_by_user_id:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT, 
                 detail=f"User ID {vendor_data.user_id} is already linked to vendor {existing_by_user_id.email}"
             )
-    
+
+def insert_vendor(db: Session, vendor_data: VendorCreate) -> DBVendor:
     # Create vendor without event association
     new_vendor = DBVendor(
         name=vendor_data.name,
         email=vendor_data.email,
         phone=vendor_data.phone,
-        user_id=vendor_data.user_id
+        user_id=str(vendor_data.user_id) if vendor_data.user_id is not None else None  # VARCHAR column
     )
     db.add(new_vendor)
+    record_vendor_changed(db, new_vendor)
     db.commit()
     db.refresh(new_vendor)
+    return new_vendor
+
+@app.post("/v1/vendors", response_model=VendorResponse, status_code=status.HTTP_201_CREATED)
+async def create_vendor(vendor_data: VendorCreate, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    """Create a new vendor (global vendor catalog). Only admins can manually create vendors.
+    Vendors are typically auto-created when users register with role='vendor'.
+    """
+    await run_in_threadpool(check_new_vendor, db, vendor_data)
+    
+    if vendor_data.user_id:
+        # The user must exist in auth and hold the vendor role
+        try:
+            auth_user = await auth_client.resolve_user(vendor_data.user_id)
+        except AuthServiceUnavailable:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Auth service unavailable, cannot verify user_id"
+            )
+        if auth_user is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"User ID {vendor_data.user_id} does not exist")
+        if auth_user["role"] != "vendor":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"User ID {vendor_data.user_id} is not a vendor account")
+    
+    new_vendor = await run_in_threadpool(insert_vendor, db, vendor_data)
+    vendor_index.upsert_vendor(new_vendor)
     
     return VendorResponse(
         id=str(new_vendor.id),
@@ -289,8 +380,68 @@ async def create_vendor(vendor_data: VendorCreate, user=Depends(require_role("ad
         phone=new_vendor.phone
     )
 
+def reconcile_run_response(run: ReconcileRun) -> dict:
+    return {
+        "run_id": str(run.id),
+        "status": run.status,
+        "apply": run.apply,
+        "full": run.full,
+        "started_at": run.started_at,
+        "updated_at": run.updated_at,
+        "finished_at": run.finished_at,
+        "error": run.error,
+        "report": run.report,
+    }
+
+@app.post("/v1/vendors/reconcile", status_code=status.HTTP_202_ACCEPTED)
+async def reconcile_vendors(
+    apply: bool = Query(False, description="Write repairs; by default only report them"),
+    full: bool = Query(False, description="Compare all user id ranges instead of starting at the checkpoint"),
+    user=Depends(require_role("admin"))
+):
+    """
+    Start comparing vendor profiles with auth vendor users, repairing missing
+    links, missing profiles and stale emails. Runs in the background; poll
+    ``GET /v1/vendors/reconcile/{run_id}`` for the report. Only admins can run reconciliation.
+    """
+    if reconcile_lock.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reconciliation is already running")
+    run = await start_reconcile(apply=apply, full=full)
+    return reconcile_run_response(run)
+
+@app.get("/v1/vendors/reconcile/{run_id}")
+def get_reconcile_run(run_id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    """Status and (partial, while running) report of a reconciliation run."""
+    run = db.get(ReconcileRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reconciliation run not found")
+    return reconcile_run_response(run)
+
+# Declared before /v1/vendors/{id} so "suggest" is not parsed as an id
+@app.get("/v1/vendors/suggest", response_model=VendorSuggestResponse)
+async def suggest_vendors(
+    prefix: str = Query(..., min_length=1, max_length=100, description="Start of a vendor name, name word or email"),
+    limit: int = Query(10, ge=1, le=20, description="Maximum number of suggestions"),
+    user=Depends(verify_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Typeahead over vendor names and emails, served from an in-memory prefix index.
+    Vendors only ever get their own profile back.
+    """
+    user_role = user.get("role")
+    if user_role not in ["admin", "organizer", "vendor"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    scope_user_id = str(user.get("sub")) if user_role == "vendor" else None
+    
+    if vendor_index.ready and not vendor_index.over_budget:
+        suggestions = vendor_index.suggest(prefix, limit, scope_user_id)
+    else:
+        suggestions = await run_in_threadpool(suggest_from_db, db, prefix, limit, scope_user_id)
+    return VendorSuggestResponse(prefix=prefix, suggestions=suggestions)
+
 @app.get("/v1/vendors/{id}")
-async def get_vendor(
+def get_vendor(
     id: int,
     fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
     user=Depends(verify_token),
@@ -311,7 +462,7 @@ async def get_vendor(
     if user_role not in ["admin", "organizer", "vendor"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
     
-    vendor = db.query(DBVendor).filter(DBVendor.id == id).first()
+    vendor = vendor_by_id(db, id)
     if not vendor:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vendor not found")
     
@@ -336,14 +487,7 @@ async def get_vendor(
     
     return vendor_data
 
-@app.patch("/v1/vendors/{id}", response_model=VendorResponse)
-async def update_vendor(id: int, vendor_data: VendorUpdate, user=Depends(verify_token), db: Session = Depends(get_db)):
-    """Update vendor information.
-    
-    - Vendors can only update their own profile (matched by user_id)
-    - Admins can update any vendor (for system management)
-    - Organizers CANNOT update vendors (vendors are independent entities)
-    """
+def apply_vendor_update(db: Session, id: int, vendor_data: VendorUpdate, user: dict) -> DBVendor:
     user_role = user.get("role")
     user_id = user.get("sub")
     
@@ -351,7 +495,7 @@ async def update_vendor(id: int, vendor_data: VendorUpdate, user=Depends(verify_
     if user_role not in ["admin", "vendor"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
     
-    vendor = db.query(DBVendor).filter(DBVendor.id == id).first()
+    vendor = vendor_by_id(db, id)
     if not vendor:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vendor not found")
     
@@ -375,16 +519,35 @@ async def update_vendor(id: int, vendor_data: VendorUpdate, user=Depends(verify_
     
     # Only admins can change email
     if vendor_data.email and user_role == "admin":
-        existing = db.query(DBVendor).filter(DBVendor.email == vendor_data.email, DBVendor.id != id).first()
-        if existing:
+        existing = vendor_by_email(db, vendor_data.email)
+        if existing and existing.id != id:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists for another vendor")
         vendor.email = vendor_data.email
     
     if vendor_data.phone is not None:
         vendor.phone = vendor_data.phone
     
-    db.commit()
+    try:
+        if db.is_modified(vendor):
+            record_vendor_changed(db, vendor)
+        db.commit()
+    except StaleDataError:
+        # Another write (e.g. a registration link) changed the vendor since it was read
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Vendor was modified concurrently, please retry")
     db.refresh(vendor)
+    return vendor
+
+@app.patch("/v1/vendors/{id}", response_model=VendorResponse)
+async def update_vendor(id: int, vendor_data: VendorUpdate, user=Depends(verify_token), db: Session = Depends(get_db)):
+    """Update vendor information.
+    
+    - Vendors can only update their own profile (matched by user_id)
+    - Admins can update any vendor (for system management)
+    - Organizers CANNOT update vendors (vendors are independent entities)
+    """
+    vendor = await run_in_threadpool(apply_vendor_update, db, id, vendor_data, user)
+    vendor_index.upsert_vendor(vendor)
     
     return VendorResponse(
         id=str(vendor.id),
@@ -393,15 +556,27 @@ async def update_vendor(id: int, vendor_data: VendorUpdate, user=Depends(verify_
         phone=vendor.phone
     )
 
-@app.delete("/v1/vendors/{id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_vendor(id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
-    """Delete a vendor from the global catalog. Only admins can delete vendors."""
-    vendor = db.query(DBVendor).filter(DBVendor.id == id).first()
+def remove_vendor(db: Session, id: int) -> int:
+    """Delete the vendor and return the version its deletion is recorded at."""
+    vendor = vendor_by_id(db, id)
     if not vendor:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vendor not found")
     
+    deleted_version = vendor.version + 1
+    record_vendor_deleted(db, vendor)
     db.delete(vendor)
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Vendor was modified concurrently, please retry")
+    return deleted_version
+
+@app.delete("/v1/vendors/{id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_vendor(id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    """Delete a vendor from the global catalog. Only admins can delete vendors."""
+    deleted_version = await run_in_threadpool(remove_vendor, db, id)
+    vendor_index.remove(id, deleted_version)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,200 @@
+"""Vendor change-event outbox and Kafka relay for Vendors service.
+
+Vendor writes append a row to ``vendor_outbox`` in the same transaction as the
+change itself, so an event is recorded if and only if the change commits. The
+relay drains the outbox in order and publishes each event to a compacted topic
+keyed by vendor id, which lets downstream services keep a local read model of
+vendors (latest row per key) instead of calling ``GET /v1/vendors/{id}``.
+
+A ``vendor.deleted`` event is followed by a tombstone (null value) for the same
+key, so compaction eventually drops deleted vendors from the topic.
+
+Event payload:
+    {"event_type": "vendor.changed" | "vendor.deleted", "vendor_id": int,
+     "version": int, "vendor": {...full row...}, "occurred_at": iso8601}
+"""
+import os
+import json
+import asyncio
+from datetime import datetime
+from aiokafka import AIOKafkaProducer
+from aiokafka.admin import AIOKafkaAdminClient, NewTopic
+from aiokafka.errors import KafkaError, TopicAlreadyExistsError
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from src.database import SessionLocal, Vendor as DBVendor, VendorOutbox
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
+VENDOR_CHANGES_TOPIC = os.getenv("VENDOR_CHANGES_TOPIC", "vendor.changes")
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_RECONNECT_MAX_DELAY = float(os.getenv("OUTBOX_RECONNECT_MAX_DELAY", "30"))
+
+VENDOR_CHANGED = "vendor.changed"
+VENDOR_DELETED = "vendor.deleted"
+
+# Arbitrary constant identifying the relay's Postgres advisory lock
+OUTBOX_LOCK_ID = 720_031
+
+
+def vendor_row(vendor: DBVendor) -> dict:
+    """Full vendor row as carried in change events."""
+    return {
+        "id": vendor.id,
+        # Always a string, as stored, whatever type the caller assigned before flush
+        "user_id": str(vendor.user_id) if vendor.user_id is not None else None,
+        "name": vendor.name,
+        "email": vendor.email,
+        "phone": vendor.phone,
+    }
+
+
+def _record(db: Session, event_type: str, vendor: DBVendor, version: int):
+    event = {
+        "event_type": event_type,
+        "vendor_id": vendor.id,
+        "version": version,
+        "vendor": vendor_row(vendor),
+        "occurred_at": datetime.utcnow().isoformat() + "Z",
+    }
+    db.add(VendorOutbox(vendor_id=vendor.id, event_type=event_type, version=version, payload=event))
+
+
+def record_vendor_changed(db: Session, vendor: DBVendor):
+    """
+    Queue a ``vendor.changed`` event for a created or updated vendor.
+    Must be called before ``db.commit()``; flushes so the id and version are assigned.
+    """
+    db.flush()
+    _record(db, VENDOR_CHANGED, vendor, vendor.version)
+
+
+def record_vendor_deleted(db: Session, vendor: DBVendor):
+    """Queue a ``vendor.deleted`` event. Must be called before ``db.delete(vendor)``."""
+    _record(db, VENDOR_DELETED, vendor, vendor.version + 1)
+
+
+class OutboxRelay:
+    """Publishes outbox rows to Kafka and removes them once acknowledged."""
+
+    def __init__(self):
+        self.producer = None
+        self.task = None
+
+    async def start(self):
+        """Try to connect once so the topic exists early, then keep draining in the background"""
+        await self._connect()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self._disconnect()
+        print("[Outbox] Relay stopped")
+
+    async def _connect(self) -> bool:
+        """Make sure the compacted topic exists and connect the producer"""
+        await self._ensure_topic()
+        producer = AIOKafkaProducer(
+            bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+            key_serializer=lambda k: str(k).encode('utf-8'),
+            # None stays None so tombstones reach the broker as null values
+            value_serializer=lambda v: json.dumps(v).encode('utf-8') if v is not None else None,
+            acks="all",
+            enable_idempotence=True,
+        )
+        try:
+            await producer.start()
+        except KafkaError as e:
+            # Events stay in the outbox until a later attempt succeeds
+            await producer.stop()
+            print(f"[Outbox] ⚠️  Failed to connect to Kafka: {e}")
+            return False
+        self.producer = producer
+        print(f"[Outbox] ✅ Relay connected to Kafka at {KAFKA_BOOTSTRAP_SERVERS}")
+        return True
+
+    async def _disconnect(self):
+        if self.producer:
+            producer, self.producer = self.producer, None
+            try:
+                await producer.stop()
+            except Exception as e:
+                print(f"[Outbox] ⚠️  Error stopping producer: {e}")
+
+    async def _ensure_topic(self):
+        admin = AIOKafkaAdminClient(bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS)
+        try:
+            await admin.start()
+            await admin.create_topics([NewTopic(
+                name=VENDOR_CHANGES_TOPIC,
+                num_partitions=3,
+                replication_factor=1,
+                topic_configs={"cleanup.policy": "compact"},
+            )])
+            print(f"[Outbox] Compacted topic '{VENDOR_CHANGES_TOPIC}' is ready")
+        except TopicAlreadyExistsError:
+            pass
+        except Exception as e:
+            print(f"[Outbox] ⚠️  Could not ensure topic '{VENDOR_CHANGES_TOPIC}': {e}")
+        finally:
+            await admin.close()
+
+    async def _run(self):
+        delay = OUTBOX_POLL_INTERVAL
+        while True:
+            if self.producer is None and not await self._connect():
+                # Reconnect with exponential backoff; the outbox keeps the events meanwhile
+                await asyncio.sleep(delay)
+                delay = min(OUTBOX_RECONNECT_MAX_DELAY, delay * 2)
+                continue
+            delay = OUTBOX_POLL_INTERVAL
+            try:
+                published = await self.publish_batch()
+            except KafkaError as e:
+                print(f"[Outbox] ❌ Kafka error, reconnecting: {e}")
+                await self._disconnect()
+                published = 0
+            except Exception as e:
+                print(f"[Outbox] ❌ Relay error: {e}")
+                published = 0
+            if published < OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    async def publish_batch(self) -> int:
+        """Publish up to ``OUTBOX_BATCH_SIZE`` events in commit order. Returns how many were sent."""
+        db = SessionLocal()
+        try:
+            if db.bind.dialect.name == "postgresql":
+                # Only one replica relays at a time so per-key order is preserved
+                locked = db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": OUTBOX_LOCK_ID}).scalar()
+                if not locked:
+                    return 0
+            rows = db.query(VendorOutbox).order_by(VendorOutbox.id).limit(OUTBOX_BATCH_SIZE).all()
+            if not rows:
+                return 0
+            for row in rows:
+                await self.producer.send_and_wait(
+                    topic=VENDOR_CHANGES_TOPIC,
+                    key=row.vendor_id,
+                    value=row.payload,
+                    headers=[("event_type", row.event_type.encode('utf-8'))],
+                )
+                if row.event_type == VENDOR_DELETED:
+                    await self.producer.send_and_wait(topic=VENDOR_CHANGES_TOPIC, key=row.vendor_id, value=None)
+                db.delete(row)
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Global instance
+outbox_relay = OutboxRelay()
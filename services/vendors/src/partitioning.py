@@ -0,0 +1,281 @@
+"""Declarative hash partitioning for the ``vendors`` table.
+
+When ``VENDORS_PARTITIONS`` is set, ``vendors`` is created as a Postgres table
+partitioned by ``HASH (id)``. Postgres only allows unique indexes on a
+partitioned table if they include the partition key, so the existing
+uniqueness of ``email`` and ``user_id`` is enforced by two narrow guard
+tables, ``vendor_emails`` and ``vendor_user_ids``, kept in sync by a trigger
+on ``vendors``. A duplicate still fails the write with a unique violation
+(``IntegrityError``), exactly as before.
+
+Lookups by id prune to a single partition. Lookups by email or user_id first
+resolve the id through the guard table and then hit one partition; use
+``vendor_email_clause`` / ``vendor_user_id_clause`` instead of filtering on
+the columns directly.
+
+Migration tooling (run with writes stopped)::
+
+    python -m src.partitioning status
+    python -m src.partitioning create --partitions 16
+    python -m src.partitioning migrate --partitions 16 --batch-size 50000
+    python -m src.partitioning rollback
+
+``migrate`` can be re-run after a failure: it continues copying after the
+highest id already in the partitioned table. ``rollback`` drops the
+partitioned table and restores ``vendors_unpartitioned``, discarding anything
+written to the partitioned table.
+"""
+import os
+import argparse
+from sqlalchemy import MetaData, Table, Column, String, BigInteger, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import ClauseElement
+
+VENDORS_PARTITIONS = int(os.getenv("VENDORS_PARTITIONS", "0"))  # 0 keeps the single table
+
+# Indexes init_db() creates on vendors. Index names are unique per schema, so
+# the old table's copies are renamed when it becomes vendors_unpartitioned
+# (init_db then builds them on the partitioned table) and back on rollback.
+VENDOR_INDEXES = ["ix_vendors_user_id_numeric", "ix_vendors_name_prefix", "ix_vendors_email_prefix"]
+
+guard_metadata = MetaData()
+
+vendor_emails = Table(
+    "vendor_emails",
+    guard_metadata,
+    Column("email", String, primary_key=True),
+    Column("vendor_id", BigInteger, nullable=False),
+)
+
+vendor_user_ids = Table(
+    "vendor_user_ids",
+    guard_metadata,
+    Column("user_id", String(50), primary_key=True),
+    Column("vendor_id", BigInteger, nullable=False),
+)
+
+# Set by init_partitioning() from the live schema, not from configuration
+enabled = False
+
+
+def partitioned_ddl(partitions: int) -> list:
+    """DDL for the partitioned ``vendors`` table, its partitions and the uniqueness guards."""
+    statements = [
+        "CREATE SEQUENCE IF NOT EXISTS vendors_id_seq",
+        """CREATE TABLE vendors (
+            id BIGINT NOT NULL DEFAULT nextval('vendors_id_seq'),
+            user_id VARCHAR(50),
+            name VARCHAR,
+            email VARCHAR NOT NULL,
+            phone VARCHAR,
+            version INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (id)
+        ) PARTITION BY HASH (id)""",
+        "ALTER SEQUENCE vendors_id_seq OWNED BY vendors.id",
+        """CREATE TABLE IF NOT EXISTS vendor_emails (
+            email VARCHAR PRIMARY KEY,
+            vendor_id BIGINT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS vendor_user_ids (
+            user_id VARCHAR(50) PRIMARY KEY,
+            vendor_id BIGINT NOT NULL
+        )""",
+        """CREATE OR REPLACE FUNCTION vendors_unique_guard() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND NEW.email IS DISTINCT FROM OLD.email) THEN
+                DELETE FROM vendor_emails WHERE email = OLD.email AND vendor_id = OLD.id;
+            END IF;
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND NEW.user_id IS DISTINCT FROM OLD.user_id) THEN
+                DELETE FROM vendor_user_ids WHERE user_id = OLD.user_id AND vendor_id = OLD.id;
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.email IS DISTINCT FROM OLD.email) THEN
+                INSERT INTO vendor_emails (email, vendor_id) VALUES (NEW.email, NEW.id);
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.user_id IS DISTINCT FROM OLD.user_id) THEN
+                IF NEW.user_id IS NOT NULL THEN
+                    INSERT INTO vendor_user_ids (user_id, vendor_id) VALUES (NEW.user_id, NEW.id);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql""",
+        """CREATE TRIGGER vendors_unique_guard
+            AFTER INSERT OR UPDATE OF email, user_id OR DELETE ON vendors
+            FOR EACH ROW EXECUTE FUNCTION vendors_unique_guard()""",
+    ]
+    for remainder in range(partitions):
+        statements.append(
+            f"CREATE TABLE vendors_p{remainder} PARTITION OF vendors "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    return statements
+
+
+def table_exists(conn, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def is_partitioned(engine: Engine) -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('vendors'))"
+        )).scalar()
+
+
+def create_partitioned_vendors(engine: Engine, partitions: int):
+    """Create the partitioned schema if ``vendors`` does not exist yet."""
+    with engine.begin() as conn:
+        if table_exists(conn, "vendors"):
+            return False
+        for statement in partitioned_ddl(partitions):
+            conn.execute(text(statement))
+    print(f"✅ Created vendors table with {partitions} hash partitions")
+    return True
+
+
+def unpartitioned_index(name: str) -> str:
+    return name.replace("ix_vendors_", "ix_vendors_unpartitioned_", 1)
+
+
+def release_index_names(conn):
+    """Rename ``VENDOR_INDEXES`` still held by ``vendors_unpartitioned`` so ``vendors`` can use them."""
+    held = conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() "
+        "AND tablename = 'vendors_unpartitioned' AND indexname = ANY(:names)"
+    ), {"names": VENDOR_INDEXES}).scalars().all()
+    for index in held:
+        conn.execute(text(f"ALTER INDEX {index} RENAME TO {unpartitioned_index(index)}"))
+
+
+def migrate_to_partitioned(engine: Engine, partitions: int, batch_size: int = 50000):
+    """
+    Move an existing single ``vendors`` table into a partitioned one.
+    The old table is kept as ``vendors_unpartitioned`` for rollback. If it
+    already exists, an earlier run was interrupted and copying resumes.
+    """
+    with engine.begin() as conn:
+        resuming = table_exists(conn, "vendors_unpartitioned")
+        if not resuming:
+            # Older tables may predate the version column
+            conn.execute(text("ALTER TABLE vendors ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+            # Detach the sequence so it survives if the old table is dropped later
+            conn.execute(text("ALTER SEQUENCE vendors_id_seq OWNED BY NONE"))
+            conn.execute(text("ALTER TABLE vendors RENAME TO vendors_unpartitioned"))
+            conn.execute(text("ALTER TABLE vendors_unpartitioned RENAME CONSTRAINT vendors_pkey TO vendors_unpartitioned_pkey"))
+            release_index_names(conn)
+            for statement in partitioned_ddl(partitions):
+                conn.execute(text(statement))
+        last_id = conn.execute(text("SELECT COALESCE(max(id), 0) FROM vendors")).scalar()
+    if resuming:
+        print(f"  resuming copy after id {last_id}")
+
+    copied = 0
+    while True:
+        # One transaction per batch keeps locks and WAL bursts bounded
+        with engine.begin() as conn:
+            row = conn.execute(text("""
+                WITH batch AS (
+                    INSERT INTO vendors (id, user_id, name, email, phone, version)
+                    SELECT id, user_id, name, email, phone, version FROM vendors_unpartitioned
+                    WHERE id > :last_id ORDER BY id LIMIT :batch_size
+                    RETURNING id
+                )
+                SELECT count(*), max(id) FROM batch
+            """), {"last_id": last_id, "batch_size": batch_size}).one()
+        if not row[0]:
+            break
+        copied += row[0]
+        last_id = row[1]
+        print(f"  copied {copied} vendors (last id {last_id})")
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "SELECT setval('vendors_id_seq', GREATEST((SELECT COALESCE(max(id), 0) FROM vendors), 1))"
+        ))
+        conn.execute(text("ANALYZE vendors"))
+    print(f"✅ Migrated {copied} vendors into {partitions} hash partitions")
+    return copied
+
+
+def rollback_partitioned(engine: Engine):
+    """Drop the partitioned ``vendors`` table and put ``vendors_unpartitioned`` back."""
+    with engine.begin() as conn:
+        if not table_exists(conn, "vendors_unpartitioned"):
+            raise RuntimeError("vendors_unpartitioned does not exist; nothing to roll back")
+        # The sequence is owned by the partitioned table; keep it when dropping that
+        conn.execute(text("ALTER SEQUENCE vendors_id_seq OWNED BY NONE"))
+        conn.execute(text("DROP TABLE IF EXISTS vendors"))
+        conn.execute(text("DROP TABLE IF EXISTS vendor_emails"))
+        conn.execute(text("DROP TABLE IF EXISTS vendor_user_ids"))
+        conn.execute(text("DROP FUNCTION IF EXISTS vendors_unique_guard()"))
+        conn.execute(text("ALTER TABLE vendors_unpartitioned RENAME TO vendors"))
+        conn.execute(text("ALTER TABLE vendors RENAME CONSTRAINT vendors_unpartitioned_pkey TO vendors_pkey"))
+        for index in VENDOR_INDEXES:
+            conn.execute(text(f"ALTER INDEX IF EXISTS {unpartitioned_index(index)} RENAME TO {index}"))
+        conn.execute(text("ALTER SEQUENCE vendors_id_seq OWNED BY vendors.id"))
+        conn.execute(text(
+            "SELECT setval('vendors_id_seq', GREATEST((SELECT COALESCE(max(id), 0) FROM vendors), 1))"
+        ))
+    print("✅ Restored the single vendors table")
+
+
+def init_partitioning(engine: Engine):
+    """Create the partitioned schema when configured and detect the live layout."""
+    global enabled
+    if engine.dialect.name != "postgresql":
+        return
+    if VENDORS_PARTITIONS > 0:
+        create_partitioned_vendors(engine, VENDORS_PARTITIONS)
+    enabled = is_partitioned(engine)
+
+
+def vendor_email_clause(vendor_model, email: str, partitioned: bool = None):
+    """Filter clause for a vendor lookup by email that prunes to one partition."""
+    if partitioned is None:
+        partitioned = enabled
+    if not partitioned:
+        return vendor_model.email == email
+    vendor_id = select(vendor_emails.c.vendor_id).where(vendor_emails.c.email == email).scalar_subquery()
+    return vendor_model.id == vendor_id
+
+
+def vendor_user_id_clause(vendor_model, user_id, partitioned: bool = None):
+    """Filter clause for a vendor lookup by auth user_id that prunes to one partition."""
+    if partitioned is None:
+        partitioned = enabled
+    if not isinstance(user_id, ClauseElement):
+        user_id = str(user_id)  # user_id is stored as VARCHAR
+    if not partitioned:
+        return vendor_model.user_id == user_id
+    vendor_id = select(vendor_user_ids.c.vendor_id).where(vendor_user_ids.c.user_id == user_id).scalar_subquery()
+    return vendor_model.id == vendor_id
+
+
+def main():
+    from src.database import engine
+
+    parser = argparse.ArgumentParser(description="Manage hash partitioning of the vendors table")
+    parser.add_argument("command", choices=["status", "create", "migrate", "rollback"])
+    parser.add_argument("--partitions", type=int, default=VENDORS_PARTITIONS or 16)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print("partitioned" if is_partitioned(engine) else "single table")
+    elif args.command == "create":
+        if not create_partitioned_vendors(engine, args.partitions):
+            print("vendors table already exists; use 'migrate' to convert it")
+    elif args.command == "migrate":
+        with engine.connect() as conn:
+            interrupted = table_exists(conn, "vendors_unpartitioned")
+        if is_partitioned(engine) and not interrupted:
+            print("vendors is already partitioned")
+            return
+        migrate_to_partitioned(engine, args.partitions, args.batch_size)
+    elif args.command == "rollback":
+        rollback_partitioned(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Prebuilt statements for the Vendors service hot paths.
+
+``get_vendor``, the write endpoints and the registration consumer run the same
+lookups on every call. Building them with ``db.query(...).filter(...)`` each
+time costs Python work: constructing the query and computing its cache key.
+The statements here are built once at import with bound parameters, so each
+call only binds values and reuses the compiled SQL. On the psycopg 3 driver
+the identical SQL text also lets Postgres reuse a server-side prepared
+statement (see ``DB_PREPARE_THRESHOLD`` in ``database.py``).
+"""
+from typing import Optional
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from src.database import Vendor
+from src import partitioning
+
+
+def _layouts(build):
+    """Prebuild a statement for the single-table and partitioned layouts."""
+    return {False: build(False), True: build(True)}
+
+
+VENDOR_BY_ID = select(Vendor).where(Vendor.id == bindparam("vendor_id"))
+
+VENDOR_BY_EMAIL = _layouts(lambda partitioned: select(Vendor).where(
+    partitioning.vendor_email_clause(Vendor, bindparam("email"), partitioned)
+))
+
+VENDOR_BY_USER_ID = _layouts(lambda partitioned: select(Vendor).where(
+    partitioning.vendor_user_id_clause(Vendor, bindparam("user_id"), partitioned)
+))
+
+VENDOR_BY_USER_ID_OR_EMAIL = _layouts(lambda partitioned: select(Vendor).where(
+    partitioning.vendor_user_id_clause(Vendor, bindparam("user_id"), partitioned)
+    | partitioning.vendor_email_clause(Vendor, bindparam("email"), partitioned)
+).limit(1))
+
+
+def vendor_by_id(db: Session, vendor_id: int) -> Optional[Vendor]:
+    return db.execute(VENDOR_BY_ID, {"vendor_id": vendor_id}).scalar_one_or_none()
+
+
+def vendor_by_email(db: Session, email: str) -> Optional[Vendor]:
+    return db.execute(VENDOR_BY_EMAIL[partitioning.enabled], {"email": email}).scalar_one_or_none()
+
+
+def vendor_by_user_id(db: Session, user_id) -> Optional[Vendor]:
+    statement = VENDOR_BY_USER_ID[partitioning.enabled]
+    return db.execute(statement, {"user_id": str(user_id)}).scalar_one_or_none()
+
+
+def vendor_by_user_id_or_email(db: Session, user_id, email: str) -> Optional[Vendor]:
+    """First vendor linked to ``user_id`` or registered with ``email``."""
+    statement = VENDOR_BY_USER_ID_OR_EMAIL[partitioning.enabled]
+    return db.execute(statement, {"user_id": str(user_id), "email": email}).scalars().first()
@@ -0,0 +1,337 @@
+"""Auth <-> Vendors reconciliation of vendor accounts.
+
+Repairs vendor profiles that drifted from auth, e.g. after missed
+``user.vendor.registered`` events, without republishing every vendor user
+like ``POST /v1/auth/sync/vendors`` does.
+
+Both sides are compared as sorted ``(user_id, email)`` sets over auth user id
+ranges. For each range auth returns a count and an md5 digest of its rows
+(``GET /v1/auth/sync/vendors/digest``) and the same digest is computed over
+the local vendors. Equal ranges are skipped; differing ranges are bisected
+until they are small, then the rows of both sides are fetched in id order
+(``GET /v1/auth/sync/vendors/chunk``) and merge-joined:
+
+    link           auth vendor user with no profile, unlinked profile with that email exists
+    create         auth vendor user with no profile at all
+    update_email   profile linked to the user but with a different email (auth owns emails)
+    orphan         profile linked to a user id that is not a vendor in auth (reported only)
+    conflict       repair would break email/user_id uniqueness (reported only)
+
+Dry runs (the default) only report. Applied repairs go through the outbox like
+any other vendor write. Database work runs in worker threads, so a run started
+through ``POST /v1/vendors/reconcile`` (recorded in ``reconcile_runs`` and
+polled by id) does not stall the service's event loop. Incremental runs start from the checkpoint left by the
+last applied run (minus ``RECONCILE_OVERLAP`` ids for registrations that
+committed out of order), so a daily run costs time proportional to new users
+and drift; ``--full`` walks all ranges and still only transfers rows for
+ranges whose digests differ. The walk and the checkpoint stop at auth's
+highest vendor user id; profiles linked above it are reported as orphans by
+one tail query without moving the checkpoint.
+
+    python -m src.reconcile                 # dry run from the checkpoint
+    python -m src.reconcile --apply
+    python -m src.reconcile --full --apply
+"""
+import os
+import json
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime
+from sqlalchemy import select, func, case, cast, literal, literal_column, BigInteger
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from src.database import SessionLocal, Vendor as DBVendor, ReconcileCheckpoint, ReconcileRun
+from src.outbox import record_vendor_changed
+from src.queries import vendor_by_id, vendor_by_email
+from src.auth_client import auth_client, AuthServiceUnavailable
+from src.suggest import vendor_index
+
+RECONCILE_RANGE_SIZE = int(os.getenv("RECONCILE_RANGE_SIZE", "100000"))
+RECONCILE_LEAF_SIZE = int(os.getenv("RECONCILE_LEAF_SIZE", "1000"))
+RECONCILE_CHUNK_SIZE = int(os.getenv("RECONCILE_CHUNK_SIZE", "1000"))
+RECONCILE_OVERLAP = int(os.getenv("RECONCILE_OVERLAP", "1000"))
+CHECKPOINT_NAME = "auth_vendors"
+MAX_REPORTED_ACTIONS = 100
+
+# vendors.user_id is VARCHAR; compare it numerically. The pattern is inlined (not
+# bound) so Postgres matches the partial index ix_vendors_user_id_numeric.
+has_numeric_user_id = DBVendor.user_id.regexp_match(literal_column("'^[0-9]{1,18}$'"))
+numeric_user_id = case((has_numeric_user_id, cast(DBVendor.user_id, BigInteger)))
+
+# Prevents overlapping runs within one process
+reconcile_lock = asyncio.Lock()
+# Background runs started by the API (kept referenced until they finish)
+reconcile_tasks = set()
+
+
+class Reconciler:
+    def __init__(self, apply: bool = False, range_size: int = RECONCILE_RANGE_SIZE,
+                 leaf_size: int = RECONCILE_LEAF_SIZE, run_id: int = None):
+        self.apply = apply
+        self.run_id = run_id
+        self.range_size = range_size
+        self.leaf_size = leaf_size
+        self.changed = []
+        self.report = {
+            "mode": "apply" if apply else "dry_run",
+            "ranges_compared": 0,
+            "ranges_merged": 0,
+            "auth_rows_fetched": 0,
+            "counts": {"link": 0, "create": 0, "update_email": 0, "orphan": 0, "conflict": 0},
+            "actions": [],
+        }
+
+    async def run(self, full: bool = False) -> dict:
+        db = SessionLocal()
+        try:
+            checkpoint = 0 if full else await asyncio.to_thread(self.checkpoint, db)
+            # Only auth ids bound the walk: a stray local user_id above them would
+            # otherwise stretch it over empty ranges and push the checkpoint past
+            # registrations that have not happened yet
+            auth_max = (await self.auth_digest(0, 0))[2] or 0
+            if checkpoint > auth_max:
+                # Left by an older run that walked past auth_max; recheck everything once
+                print(f"[Reconcile] ⚠️  Checkpoint {checkpoint} is above auth max id {auth_max}, starting from 0")
+                checkpoint = 0
+            start = max(checkpoint - RECONCILE_OVERLAP, 0)
+            upper = auth_max + 1
+            self.report.update({"from_user_id": start, "to_user_id": auth_max})
+
+            lo = start
+            while lo < upper:
+                hi = min(lo + self.range_size, upper)
+                await self.reconcile_range(db, lo, hi)
+                if self.apply:
+                    await asyncio.to_thread(self.save_checkpoint, db, hi - 1)
+                if self.run_id is not None:
+                    await asyncio.to_thread(save_run, self.run_id, report=self.report)
+                lo = hi
+            # Profiles linked above every auth vendor id cannot match anything
+            for user_id, vendor_id, email in await asyncio.to_thread(self.local_rows, db, upper):
+                self.record("orphan", user_id=user_id, vendor_id=vendor_id, email=email)
+            return self.report
+        finally:
+            db.close()
+
+    def checkpoint(self, db: Session) -> int:
+        row = db.get(ReconcileCheckpoint, CHECKPOINT_NAME)
+        return row.last_user_id if row else 0
+
+    def save_checkpoint(self, db: Session, last_user_id: int):
+        row = db.get(ReconcileCheckpoint, CHECKPOINT_NAME)
+        if row is None:
+            db.add(ReconcileCheckpoint(name=CHECKPOINT_NAME, last_user_id=last_user_id))
+        else:
+            row.last_user_id = last_user_id
+            row.updated_at = datetime.utcnow()
+        db.commit()
+
+    async def auth_digest(self, lo: int, hi: int):
+        response = await auth_client.request(
+            "GET", "/v1/auth/sync/vendors/digest", params={"from_id": lo, "to_id": hi}
+        )
+        response.raise_for_status()
+        body = response.json()
+        return body["count"], body["digest"], body["max_id"]
+
+    async def auth_rows(self, lo: int, hi: int) -> list:
+        rows = []
+        after_id = max(lo - 1, 0)
+        while after_id is not None:
+            response = await auth_client.request(
+                "GET", "/v1/auth/sync/vendors/chunk",
+                params={"after_id": after_id, "before_id": hi, "limit": RECONCILE_CHUNK_SIZE},
+            )
+            response.raise_for_status()
+            body = response.json()
+            rows.extend((user["id"], user["email"]) for user in body["users"])
+            after_id = body["next_after_id"]
+        self.report["auth_rows_fetched"] += len(rows)
+        return rows
+
+    def local_digest(self, db: Session, lo: int, hi: int):
+        """Same digest as auth's ``vendor_users_digest`` over local ``(user_id, email)``."""
+        in_range = (has_numeric_user_id, numeric_user_id >= lo, numeric_user_id < hi)
+        if db.bind.dialect.name == "postgresql":
+            line = func.concat(numeric_user_id, ":", DBVendor.email)
+            return tuple(db.execute(select(
+                func.count(),
+                func.md5(func.string_agg(line, aggregate_order_by(literal("\n"), numeric_user_id))),
+            ).where(*in_range)).one())
+        lines = [f"{user_id}:{email}" for user_id, _, email in self.local_rows(db, lo, hi)]
+        return len(lines), hashlib.md5("\n".join(lines).encode("utf-8")).hexdigest() if lines else None
+
+    def local_rows(self, db: Session, lo: int, hi: int = None) -> list:
+        query = select(numeric_user_id, DBVendor.id, DBVendor.email).where(has_numeric_user_id, numeric_user_id >= lo)
+        if hi is not None:
+            query = query.where(numeric_user_id < hi)
+        return db.execute(query.order_by(numeric_user_id)).all()
+
+    async def reconcile_range(self, db: Session, lo: int, hi: int):
+        auth_count, auth_digest, _ = await self.auth_digest(lo, hi)
+        local_count, local_digest = await asyncio.to_thread(self.local_digest, db, lo, hi)
+        self.report["ranges_compared"] += 1
+        if (auth_count, auth_digest) == (local_count, local_digest):
+            return
+        # Narrow down to the drifted ids unless fetching both sides is already cheap
+        if hi - lo > self.leaf_size and min(auth_count, local_count) > 0 \
+                and max(auth_count, local_count) > RECONCILE_CHUNK_SIZE:
+            mid = (lo + hi) // 2
+            await self.reconcile_range(db, lo, mid)
+            await self.reconcile_range(db, mid, hi)
+            return
+        await self.merge_range(db, lo, hi)
+
+    async def merge_range(self, db: Session, lo: int, hi: int):
+        """Merge-join auth and local rows of one range (both sorted by user id)."""
+        auth = await self.auth_rows(lo, hi)
+        await asyncio.to_thread(self.merge_rows, db, lo, hi, auth)
+        # The index is not thread-safe; update it from the event loop
+        for fields in self.changed:
+            vendor_index.upsert(*fields)
+        self.changed = []
+
+    def merge_rows(self, db: Session, lo: int, hi: int, auth: list):
+        local = self.local_rows(db, lo, hi)
+        self.report["ranges_merged"] += 1
+        i = j = 0
+        while i < len(auth) or j < len(local):
+            if j == len(local) or (i < len(auth) and auth[i][0] < local[j][0]):
+                self.missing_vendor(db, *auth[i])
+                i += 1
+            elif i == len(auth) or local[j][0] < auth[i][0]:
+                self.record("orphan", user_id=local[j][0], vendor_id=local[j][1], email=local[j][2])
+                j += 1
+            else:
+                if auth[i][1] != local[j][2]:
+                    self.email_mismatch(db, local[j][1], auth[i][0], auth[i][1], local[j][2])
+                i += 1
+                j += 1
+        if self.apply:
+            db.commit()
+            # Read the committed rows here, not lazily from the event loop
+            self.changed = [(v.id, v.name, v.email, v.user_id, v.version) for v in self.changed]
+
+    def missing_vendor(self, db: Session, user_id: int, email: str):
+        vendor = vendor_by_email(db, email)
+        if vendor is not None and vendor.user_id is not None:
+            self.record("conflict", user_id=user_id, vendor_id=vendor.id, email=email,
+                        reason=f"email already linked to user_id {vendor.user_id}")
+        elif vendor is not None:
+            self.repair(db, "link", vendor, user_id=user_id, email=email)
+        else:
+            self.repair(db, "create", DBVendor(user_id=str(user_id), email=email, name=None, phone=None),
+                        user_id=user_id, email=email)
+
+    def email_mismatch(self, db: Session, vendor_id: int, user_id: int, email: str, old_email: str):
+        other = vendor_by_email(db, email)
+        if other is not None and other.id != vendor_id:
+            self.record("conflict", user_id=user_id, vendor_id=vendor_id, email=email,
+                        reason=f"email already used by vendor {other.id}")
+            return
+        self.repair(db, "update_email", vendor_by_id(db, vendor_id), user_id=user_id, email=email, old_email=old_email)
+
+    def repair(self, db: Session, action: str, vendor: DBVendor, user_id: int, email: str, **details):
+        if not self.apply:
+            self.record(action, user_id=user_id, vendor_id=vendor.id, email=email, **details)
+            return
+        try:
+            # Savepoint so one failed repair does not roll back the rest of the range
+            with db.begin_nested():
+                if action == "create":
+                    db.add(vendor)
+                vendor.user_id = str(user_id)
+                vendor.email = email
+                record_vendor_changed(db, vendor)
+        except (IntegrityError, StaleDataError) as e:
+            self.record("conflict", user_id=user_id, vendor_id=vendor.id, email=email,
+                        reason=f"{action} failed: {e.orig}")
+            return
+        self.changed.append(vendor)
+        self.record(action, user_id=user_id, vendor_id=vendor.id, email=email, **details)
+
+    def record(self, action: str, **details):
+        self.report["counts"][action] += 1
+        if len(self.report["actions"]) < MAX_REPORTED_ACTIONS:
+            self.report["actions"].append({"action": action, **details})
+
+
+def save_run(run_id: int, **fields):
+    db = SessionLocal()
+    try:
+        db.query(ReconcileRun).filter(ReconcileRun.id == run_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+def create_run(apply: bool, full: bool) -> ReconcileRun:
+    db = SessionLocal()
+    try:
+        run = ReconcileRun(apply=apply, full=full)
+        db.add(run)
+        db.commit()
+        db.refresh(run)
+        return run
+    finally:
+        db.close()
+
+
+async def start_reconcile(apply: bool = False, full: bool = False) -> ReconcileRun:
+    """
+    Record a run and start it in the background; poll ``reconcile_runs`` for
+    the report. Callers check ``reconcile_lock`` first (taken here without waiting).
+    """
+    await reconcile_lock.acquire()
+    try:
+        run = await asyncio.to_thread(create_run, apply, full)
+    except Exception:
+        reconcile_lock.release()
+        raise
+    task = asyncio.create_task(execute_run(run.id, apply, full))
+    reconcile_tasks.add(task)
+    task.add_done_callback(reconcile_tasks.discard)
+    return run
+
+
+async def execute_run(run_id: int, apply: bool, full: bool):
+    try:
+        reconciler = Reconciler(apply=apply, run_id=run_id)
+        try:
+            report = await reconciler.run(full=full)
+            fields = {"status": "succeeded", "report": report}
+        except AuthServiceUnavailable as e:
+            fields = {"status": "failed", "report": reconciler.report, "error": f"Auth service unavailable: {e}"}
+        except Exception as e:
+            print(f"[Reconcile] ❌ Run {run_id} failed: {e}")
+            fields = {"status": "failed", "report": reconciler.report, "error": str(e)}
+        await asyncio.to_thread(save_run, run_id, finished_at=datetime.utcnow(), **fields)
+    finally:
+        reconcile_lock.release()
+
+
+async def run_cli(args):
+    from src.database import init_db
+
+    init_db()
+    await auth_client.start()
+    try:
+        report = await Reconciler(apply=args.apply, range_size=args.range_size).run(full=args.full)
+    finally:
+        await auth_client.stop()
+    print(json.dumps(report, indent=2, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile vendor profiles with auth vendor users")
+    parser.add_argument("--apply", action="store_true", help="Write repairs (default: dry run)")
+    parser.add_argument("--full", action="store_true", help="Compare all id ranges, ignoring the checkpoint")
+    parser.add_argument("--range-size", type=int, default=RECONCILE_RANGE_SIZE)
+    asyncio.run(run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
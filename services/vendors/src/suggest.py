@@ -0,0 +1,282 @@
+"""In-memory prefix index for vendor typeahead (``GET /v1/vendors/suggest``).
+
+Every vendor contributes a few lowercase keys - its full name, each later word
+of the name, and its email - to a sorted list of keys with a parallel array of
+vendor ids (no per-entry tuple, which roughly halves the footprint). Entries
+are ordered by ``(key, vendor_id)``. A prefix query is a binary search to the first key ``>= prefix``
+followed by a short forward scan, so it costs O(log n + limit) and never
+touches the database.
+
+The index is loaded from the database at startup and kept current from the
+vendor write endpoints, the registration consumer and the ``vendor.changes``
+stream (so writes handled by other replicas show up too). Every update carries
+the vendor's ``version``; stale or replayed updates are ignored. Deletes leave
+a tombstone so a replayed update cannot bring the vendor back; tombstones are
+dropped on reload, when a newer version supersedes them and past
+``SUGGEST_MAX_TOMBSTONES``.
+
+Until the index is loaded, or when the catalog exceeds ``SUGGEST_MAX_VENDORS``,
+``suggest_from_db`` answers instead. It is a degraded mode: it matches the
+start of the full name or the email, backed by the ``ix_vendors_name_prefix``
+and ``ix_vendors_email_prefix`` expression indexes, but not later name words
+(a ``'% word'`` match cannot use a btree index).
+"""
+import os
+import sys
+import time
+import random
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+from sqlalchemy import select, func, literal
+from sqlalchemy.orm import Session
+
+from src.database import Vendor as DBVendor
+from src.queries import vendor_by_user_id
+
+# ~630 MiB per million vendors (scripts/bench_suggest.py); the default fits the 512Mi pod limit
+SUGGEST_MAX_VENDORS = int(os.getenv("SUGGEST_MAX_VENDORS", "250000"))
+SUGGEST_LOAD_BATCH = 10000
+# Deletes remembered to reject replayed updates; only events still in flight
+# on the change stream need one, so the oldest are dropped past this many
+SUGGEST_MAX_TOMBSTONES = 10000
+
+
+def index_keys(name: Optional[str], email: str) -> List[str]:
+    """Lowercase search keys for a vendor: full name, later name words, email."""
+    keys = []
+    if name:
+        name = name.strip().lower()
+        if name:
+            keys.append(name)
+            words = name.split()
+            for i in range(1, len(words)):
+                keys.append(" ".join(words[i:]))
+    if email:
+        keys.append(email.strip().lower())
+    return list(dict.fromkeys(keys))  # de-duplicate, keep order
+
+
+class VendorPrefixIndex:
+    def __init__(self, max_vendors: int = SUGGEST_MAX_VENDORS):
+        self.max_vendors = max_vendors
+        self.keys: List[str] = []  # sorted; ties ordered by vendor id
+        self.ids = array("q")  # vendor id of each key
+        self.vendors: Dict[int, tuple] = {}  # vendor_id -> (name, email, user_id, version, keys)
+        self.by_user_id: Dict[str, int] = {}
+        self.tombstones: Dict[int, int] = {}  # vendor_id -> version it was deleted at
+        self.ready = False
+        self.over_budget = False
+        self.load_seconds = None
+
+    def load(self, db: Session):
+        """Rebuild the index from the database in one pass, then sort once."""
+        self.install(self.snapshot(db))
+
+    def snapshot(self, db: Session) -> Optional[tuple]:
+        """
+        Read and sort every vendor's keys, or ``None`` above ``max_vendors``.
+        Touches no index state, so it can run in a worker thread.
+        """
+        start = time.perf_counter()
+        entries, vendors, by_user_id = [], {}, {}
+        rows = db.execute(
+            select(DBVendor.id, DBVendor.name, DBVendor.email, DBVendor.user_id, DBVendor.version)
+            .execution_options(yield_per=SUGGEST_LOAD_BATCH)
+        )
+        for vendor_id, name, email, user_id, version in rows:
+            if len(vendors) >= self.max_vendors:
+                return None
+            keys = index_keys(name, email)
+            vendors[vendor_id] = (name, email, user_id, version, keys)
+            if user_id is not None:
+                by_user_id[user_id] = vendor_id
+            entries.extend((key, vendor_id) for key in keys)
+        entries.sort()
+        keys = [key for key, _ in entries]
+        ids = array("q", (vendor_id for _, vendor_id in entries))
+        return keys, ids, vendors, by_user_id, time.perf_counter() - start
+
+    def install(self, snapshot: Optional[tuple]):
+        """Swap in a ``snapshot()`` result."""
+        if snapshot is None:
+            self.over_budget = True
+            print(f"[Suggest] ⚠️  More than {self.max_vendors} vendors, typeahead falls back to the database")
+            return
+        self.keys, self.ids, self.vendors, self.by_user_id, self.load_seconds = snapshot
+        # The snapshot already excludes deleted vendors; deletes still in flight
+        # are read from offsets fixed before it was taken and record new tombstones
+        self.tombstones.clear()
+        self.over_budget = False
+        self.ready = True
+        print(f"[Suggest] ✅ Indexed {len(self.vendors)} vendors ({len(self.keys)} keys) in {self.load_seconds:.2f}s")
+
+    def _position(self, key: str, vendor_id: int) -> int:
+        """Index of ``(key, vendor_id)``, or where it would be inserted."""
+        lo = bisect_left(self.keys, key)
+        hi = bisect_right(self.keys, key, lo)
+        return bisect_left(self.ids, vendor_id, lo, hi)
+
+    def _add_keys(self, vendor_id: int, keys: List[str]):
+        for key in keys:
+            i = self._position(key, vendor_id)
+            self.keys.insert(i, key)
+            self.ids.insert(i, vendor_id)
+
+    def _remove_keys(self, vendor_id: int, keys: List[str]):
+        for key in keys:
+            i = self._position(key, vendor_id)
+            if i < len(self.keys) and self.keys[i] == key and self.ids[i] == vendor_id:
+                del self.keys[i]
+                del self.ids[i]
+
+    def upsert(self, vendor_id: int, name: Optional[str], email: str, user_id: Optional[str], version: int):
+        """Add or replace a vendor unless the index already holds a newer version."""
+        if not self.ready:
+            return
+        # Scoped lookups use str(sub); events and VendorCreate may carry an int
+        user_id = str(user_id) if user_id is not None else None
+        current = self.vendors.get(vendor_id)
+        if current is not None and current[3] >= version:
+            return
+        if self.tombstones.get(vendor_id, 0) >= version:
+            return
+        self.tombstones.pop(vendor_id, None)  # superseded by a newer version
+        if current is not None:
+            self._remove_keys(vendor_id, current[4])
+            if current[2] is not None and self.by_user_id.get(current[2]) == vendor_id:
+                del self.by_user_id[current[2]]
+        elif len(self.vendors) >= self.max_vendors:
+            self.over_budget = True
+            return
+        keys = index_keys(name, email)
+        self._add_keys(vendor_id, keys)
+        self.vendors[vendor_id] = (name, email, user_id, version, keys)
+        if user_id is not None:
+            self.by_user_id[user_id] = vendor_id
+
+    def upsert_vendor(self, vendor: DBVendor):
+        self.upsert(vendor.id, vendor.name, vendor.email, vendor.user_id, vendor.version)
+
+    def remove(self, vendor_id: int, version: int):
+        """Drop a deleted vendor; later updates with a version <= ``version`` are ignored."""
+        if not self.ready:
+            return
+        self.tombstones[vendor_id] = max(version, self.tombstones.pop(vendor_id, 0))  # re-insert as newest
+        if len(self.tombstones) > SUGGEST_MAX_TOMBSTONES:
+            del self.tombstones[next(iter(self.tombstones))]
+        current = self.vendors.pop(vendor_id, None)
+        if current is None:
+            return
+        self._remove_keys(vendor_id, current[4])
+        if current[2] is not None and self.by_user_id.get(current[2]) == vendor_id:
+            del self.by_user_id[current[2]]
+
+    def apply_event(self, event: dict):
+        """Apply a ``vendor.changed`` / ``vendor.deleted`` event from the change stream."""
+        vendor = event.get("vendor") or {}
+        if event.get("event_type") == "vendor.deleted":
+            self.remove(event["vendor_id"], event["version"])
+        else:
+            self.upsert(event["vendor_id"], vendor.get("name"), vendor.get("email"),
+                        vendor.get("user_id"), event["version"])
+
+    def suggest(self, prefix: str, limit: int = 10, scope_user_id: Optional[str] = None) -> List[dict]:
+        """
+        Vendors with a key starting with ``prefix``, in key order.
+        ``scope_user_id`` restricts results to the vendor linked to that auth user.
+        """
+        prefix = prefix.strip().lower()
+        if scope_user_id is not None:
+            vendor_id = self.by_user_id.get(scope_user_id)
+            if vendor_id is None:
+                return []
+            vendor = self.vendors[vendor_id]
+            if any(key.startswith(prefix) for key in vendor[4]):
+                return [self._result(vendor_id, vendor)]
+            return []
+
+        results, seen = [], set()
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(results) < limit:
+            if not self.keys[i].startswith(prefix):
+                break
+            vendor_id = self.ids[i]
+            if vendor_id not in seen:
+                seen.add(vendor_id)
+                results.append(self._result(vendor_id, self.vendors[vendor_id]))
+            i += 1
+        return results
+
+    @staticmethod
+    def _result(vendor_id: int, vendor: tuple) -> dict:
+        return {"id": str(vendor_id), "name": vendor[0], "email": vendor[1]}
+
+    def memory_estimate(self, sample_size: int = 1000) -> int:
+        """Approximate bytes held by the index, extrapolated from a random sample."""
+        fixed = (sys.getsizeof(self.keys) + sys.getsizeof(self.ids) + sys.getsizeof(self.vendors)
+                 + sys.getsizeof(self.by_user_id) + sys.getsizeof(self.tombstones))
+        if not self.keys:
+            return fixed
+        key_sample = random.sample(self.keys, min(sample_size, len(self.keys)))
+        per_key = sum(sys.getsizeof(key) for key in key_sample) / len(key_sample)
+        vendor_sample = random.sample(list(self.vendors.values()), min(sample_size, len(self.vendors)))
+        per_vendor = sum(
+            sys.getsizeof(v) + sum(sys.getsizeof(f) for f in v[:3] if f is not None) + sys.getsizeof(v[4])
+            for v in vendor_sample
+        ) / max(len(vendor_sample), 1)
+        return int(fixed + per_key * len(self.keys) + per_vendor * len(self.vendors))
+
+    def stats(self) -> dict:
+        memory = self.memory_estimate()
+        return {
+            "ready": self.ready,
+            "over_budget": self.over_budget,
+            "vendors": len(self.vendors),
+            "keys": len(self.keys),
+            "tombstones": len(self.tombstones),
+            "memory_bytes": memory,
+            "memory_bytes_per_million_vendors": int(memory / len(self.vendors) * 1_000_000) if self.vendors else None,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+        }
+
+
+def _prefix_query(db: Session, column, prefix: str, limit: int):
+    """Vendors whose lowercased ``column`` starts with ``prefix``, in key order."""
+    key = func.lower(column)
+    if db.bind.dialect.name == "postgresql":
+        # Matches the "C" collation expression indexes, so LIKE 'p%' is an index
+        # range scan already in ORDER BY order and LIMIT stops it early
+        key = key.collate("C")
+    pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    # Inlined so the planner sees a constant pattern it can turn into an index range
+    match = key.like(literal(pattern, literal_execute=True), escape="\\")
+    return db.execute(
+        select(key, DBVendor.id, DBVendor.name, DBVendor.email).where(match).order_by(key).limit(limit)
+    ).all()
+
+
+def suggest_from_db(db: Session, prefix: str, limit: int = 10, scope_user_id: Optional[str] = None) -> List[dict]:
+    """
+    Database fallback for ``VendorPrefixIndex.suggest``: full-name and email
+    prefixes only, merged in key order.
+    """
+    prefix = prefix.strip().lower()
+    if scope_user_id is not None:
+        vendor = vendor_by_user_id(db, scope_user_id)
+        if vendor is not None and any(key.startswith(prefix) for key in index_keys(vendor.name, vendor.email)):
+            return [{"id": str(vendor.id), "name": vendor.name, "email": vendor.email}]
+        return []
+
+    rows = _prefix_query(db, DBVendor.name, prefix, limit) + _prefix_query(db, DBVendor.email, prefix, limit)
+    rows.sort(key=lambda row: (row[0], row[1]))
+    results, seen = [], set()
+    for _, vendor_id, name, email in rows:
+        if vendor_id not in seen and len(results) < limit:
+            seen.add(vendor_id)
+            results.append({"id": str(vendor_id), "name": name, "email": email})
+    return results
+
+
+# Global instance
+vendor_index = VendorPrefixIndex()